@@ -0,0 +1,113 @@
+"""Measure decks analyzed per second, with and without the http endpoint.
+
+Run from the repository root with `python -m benchmarks.decks`.
+"""
+from argparse import ArgumentParser
+from asyncio import run
+from base64 import b64encode
+from json import dumps
+from random import Random
+from time import perf_counter
+
+from aiohttp import ClientSession
+from aiohttp.web import Application, AppRunner, TCPSite
+
+from util import DeckAnalyzer, DeckPreviews, hash_to_deck
+
+HERMIT_TYPES = ("miner", "pvp", "builder", "balanced", "farm")
+
+
+class BenchmarkCard:
+
+    """The parts of a card deck analysis reads."""
+
+    def __init__(self: "BenchmarkCard", numeric_id: int) -> None:
+        """Create a card, a third each of hermits, effects and items.
+
+        Args:
+        ----
+        numeric_id (int): The card's numeric id
+        """
+        self.numeric_id: int = numeric_id
+        self.text_id: str = ("hermit_{}_rare", "effect_{}", "item_{}_common")[
+            numeric_id % 3
+        ].format(numeric_id)
+        self.cost: int = numeric_id % 4
+        self.hermit_type: str = HERMIT_TYPES[numeric_id % len(HERMIT_TYPES)]
+
+
+def make_decks(count: int, seed: int = 0) -> list[str]:
+    """Create random 42 card deck hashes.
+
+    Args:
+    ----
+    count (int): The number of decks
+    seed (int): Optional, the random seed
+    """
+    rng = Random(seed)  # noqa: S311
+    return [
+        b64encode(bytes(rng.randrange(1, 120) for _ in range(42))).decode()
+        for _ in range(count)
+    ]
+
+
+def bench_analyzer(universe: dict, decks: list[str]) -> None:
+    """Compare hash_to_deck with the analyzer.
+
+    Args:
+    ----
+    universe (dict): The cards to decode decks with
+    decks (list): The deck hashes
+    """
+    start = perf_counter()
+    for deck_hash in decks:
+        hash_to_deck(deck_hash, universe)
+    print(f"hash_to_deck:   {len(decks) / (perf_counter() - start):>10.0f} decks/s")
+    analyzer = DeckAnalyzer(universe)
+    start = perf_counter()
+    for _ in analyzer.analyze_many(decks):
+        pass
+    print(f"DeckAnalyzer:   {len(decks) / (perf_counter() - start):>10.0f} decks/s")
+
+
+async def bench_endpoint(universe: dict, decks: list[str], port: int) -> None:
+    """Post the decks to a local server in one batch.
+
+    Args:
+    ----
+    universe (dict): The cards to decode decks with
+    decks (list): The deck hashes
+    port (int): The port to run the local server on
+    """
+    web_server = Application()
+    DeckPreviews(universe, web_server, max_batch=len(decks))
+    runner = AppRunner(web_server)
+    await runner.setup()
+    await TCPSite(runner, "127.0.0.1", port).start()
+
+    url = f"http://127.0.0.1:{port}/decks/analyze"
+    async with ClientSession() as session:
+        for accept in ("application/json", "application/x-ndjson"):
+            start = perf_counter()
+            async with session.post(
+                url, data=dumps(decks), headers={"Accept": accept}
+            ) as response:
+                response.raise_for_status()
+                await response.read()
+            elapsed = perf_counter() - start
+            print(f"{accept + ':':<25} {len(decks) / elapsed:>10.0f} decks/s")
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--decks", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8096)
+    args = parser.parse_args()
+
+    universe = {
+        card.text_id: card for card in map(BenchmarkCard, range(1, 120))
+    }
+    decks = make_decks(args.decks)
+    bench_analyzer(universe, decks)
+    run(bench_endpoint(universe, decks, args.port))
@@ -0,0 +1,463 @@
+"""Load test the webhook endpoints and match lifecycle against a fake hc-tcg server.
+
+Run from the repository root with `python -m benchmarks.load_test`, no network
+access or discord connection is needed.
+"""
+from argparse import ArgumentParser
+from asyncio import Queue, Semaphore, create_task, gather, run, sleep
+from collections import defaultdict
+from itertools import count
+from json import dumps
+from random import Random
+from time import perf_counter
+from typing import Any, Optional
+
+from aiohttp import ClientSession
+from aiohttp.web import (
+    Application,
+    AppRunner,
+    Request,
+    Response,
+    TCPSite,
+    json_response,
+    post,
+)
+from aiohttp.web import get as get_route
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from benchmarks.payloads import (
+    game_end_payload,
+    game_start_payload,
+    private_cancel_payload,
+)
+from util import Match, MatchStateEnum, Server, ServerManager
+
+API_KEY = "load-test-key"
+SERVER_KEY = "load-test-server-key"
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Get a percentile of some values.
+
+    Args:
+    ----
+    values (list[float]): The values, does not need to be sorted
+    percent (float): The percentile to get, between 0 and 100
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+class Recorder:
+
+    """Collect latencies for named operations."""
+
+    def __init__(self: "Recorder") -> None:
+        """Collect latencies for named operations."""
+        self.latencies: defaultdict[str, list[float]] = defaultdict(list)
+
+    def add(self: "Recorder", name: str, seconds: float) -> None:
+        """Record how long an operation took.
+
+        Args:
+        ----
+        name (str): The operation name
+        seconds (float): How long the operation took
+        """
+        self.latencies[name].append(seconds)
+
+    def report(self: "Recorder", elapsed: float) -> None:
+        """Print latency percentiles and throughput for every operation.
+
+        Args:
+        ----
+        elapsed (float): The length of the test in seconds
+        """
+        print(
+            f"{'operation':<24}{'count':>8}{'per s':>10}"
+            f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        )
+        for name, values in sorted(self.latencies.items()):
+            print(
+                f"{name:<24}{len(values):>8}{len(values) / elapsed:>10.1f}"
+                + "".join(
+                    f"{percentile(values, percent) * 1000:>10.1f}"
+                    for percent in (50, 90, 99, 100)
+                )
+            )
+
+
+class FakeMessage:
+
+    """Stand-in for a discord message."""
+
+    ids = count(10**18)
+
+    def __init__(self: "FakeMessage", latency: float) -> None:
+        """Stand-in for a discord message.
+
+        Args:
+        ----
+        latency (float): Seconds each discord call takes
+        """
+        self.id: int = next(self.ids)
+        self.latency: float = latency
+
+    async def edit(self: "FakeMessage", **_kwargs: Any) -> None:  # noqa: ANN401
+        """Pretend to edit the message."""
+        await sleep(self.latency)
+
+
+class FakeThread(FakeMessage):
+
+    """Stand-in for a discord thread."""
+
+    async def join(self: "FakeThread") -> None:
+        """Pretend to join the thread."""
+        await sleep(self.latency)
+
+    async def send(self: "FakeThread", **_kwargs: Any) -> FakeMessage:  # noqa: ANN401
+        """Pretend to send a message in the thread."""
+        await sleep(self.latency)
+        return FakeMessage(self.latency)
+
+
+class FakeChannel:
+
+    """Stand-in for a discord text channel."""
+
+    def __init__(self: "FakeChannel", latency: float) -> None:
+        """Stand-in for a discord text channel.
+
+        Args:
+        ----
+        latency (float): Seconds each discord call takes
+        """
+        self.latency: float = latency
+
+    async def create_private_thread(
+        self: "FakeChannel",
+        *_args: Any,  # noqa: ANN401
+        **_kwargs: Any,  # noqa: ANN401
+    ) -> FakeThread:
+        """Pretend to create a thread."""
+        await sleep(self.latency)
+        return FakeThread(self.latency)
+
+
+class FakeContext:
+
+    """Stand-in for the context of a slash command."""
+
+    def __init__(self: "FakeContext", latency: float) -> None:
+        """Stand-in for the context of a slash command.
+
+        Args:
+        ----
+        latency (float): Seconds each discord call takes
+        """
+        self.latency: float = latency
+        self.channel: FakeChannel = FakeChannel(latency)
+        self.guild_id: int = 0
+        self.channel_id: int = 0
+
+    async def send(self: "FakeContext", **_kwargs: Any) -> FakeMessage:  # noqa: ANN401
+        """Pretend to reply to the command."""
+        await sleep(self.latency)
+        return FakeMessage(self.latency)
+
+
+class TimedMatch(Match):
+
+    """A match that reports its state changes."""
+
+    def __init__(self: "TimedMatch", *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+        """Create a match that reports its state changes."""
+        super().__init__(*args, **kwargs)
+        self.changes: Queue = Queue()
+        self.codes: Queue = Queue()
+
+    async def start_game(self: "TimedMatch") -> None:
+        """Create a game and report its code."""
+        await super().start_game()
+        self.codes.put_nowait(prepared_code(self.server, self))
+
+    async def set_state(self: "TimedMatch", new_state: MatchStateEnum) -> None:
+        """Update the state and report the change."""
+        await super().set_state(new_state)
+        self.changes.put_nowait(new_state)
+
+    async def wait_for_state(self: "TimedMatch", *states: MatchStateEnum) -> None:
+        """Wait until the match enters one of `states`."""
+        while await self.changes.get() not in states:
+            pass
+
+
+class FakeHcTcgServer:
+
+    """A local stand-in for an hc-tcg server that sends webhooks to the bot."""
+
+    def __init__(
+        self: "FakeHcTcgServer", bot_url: str, recorder: Recorder, seed: int
+    ) -> None:
+        """Create the fake server.
+
+        Args:
+        ----
+        bot_url (str): The url of the bot's web server
+        recorder (Recorder): Where to record webhook latencies
+        seed (int): Seed for random codes and results
+        """
+        self.bot_url: str = bot_url
+        self.recorder: Recorder = recorder
+        self.random: Random = Random(seed)  # noqa: S311
+        self.game_ids = count()
+
+        self.active_games: dict[str, dict] = {}
+        self.session: Optional[ClientSession] = None
+
+        self.app = Application()
+        self.app.add_routes(
+            [
+                get_route("/api/games", self.get_games),
+                post("/api/createGame", self.create_game),
+            ]
+        )
+
+    async def get_games(self: "FakeHcTcgServer", req: Request) -> Response:
+        """List the active games."""
+        if req.headers.get("api-key") != SERVER_KEY:
+            return Response(status=403)
+        return json_response(list(self.active_games.values()))
+
+    async def create_game(self: "FakeHcTcgServer", req: Request) -> Response:
+        """Create a private game code."""
+        if req.headers.get("api-key") != SERVER_KEY:
+            return Response(status=403)
+        return json_response({"code": f"{self.random.getrandbits(24):06x}"})
+
+    def new_game_id(self: "FakeHcTcgServer") -> str:
+        """Get a unique game id."""
+        return f"game-{next(self.game_ids)}"
+
+    async def send(self: "FakeHcTcgServer", endpoint: str, payload: dict) -> None:
+        """Send a webhook to the bot and record how long it took.
+
+        Args:
+        ----
+        endpoint (str): The webhook name, such as game_start
+        payload (dict): The data to send
+        """
+        start = perf_counter()
+        async with self.session.post(
+            f"{self.bot_url}/admin/{endpoint}",
+            data=dumps(payload),
+            headers={"api-key": API_KEY},
+        ) as response:
+            await response.read()
+        self.recorder.add(f"webhook {endpoint}", perf_counter() - start)
+        if response.status >= 300:
+            self.recorder.add(f"webhook {endpoint} {response.status}", 0)
+
+    async def start_game(self: "FakeHcTcgServer", game_id: str, code: str) -> None:
+        """Start a game and tell the bot.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        code (str): The code of the game, if private
+        """
+        payload = game_start_payload(game_id, code)
+        self.active_games[game_id] = payload
+        await self.send("game_start", payload)
+
+    async def end_game(
+        self: "FakeHcTcgServer", game_id: str, code: str, winner: int
+    ) -> None:
+        """End a game and tell the bot.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        code (str): The code of the game, if private
+        winner (int): The index of the player that won
+        """
+        self.active_games.pop(game_id, None)
+        await self.send("game_end", game_end_payload(game_id, code, winner=winner))
+
+    async def public_game(self: "FakeHcTcgServer") -> None:
+        """Play a public game that no match is following."""
+        game_id = self.new_game_id()
+        await self.start_game(game_id, None)
+        await self.end_game(game_id, None, self.random.randrange(2))
+
+
+def prepared_code(server: Server, match: Match) -> Optional[str]:
+    """Get the newest game code prepared by a match.
+
+    Args:
+    ----
+    server (Server): The server the match is on
+    match (Match): The match to get the code for
+    """
+    return next(
+        (
+            code
+            for code, (callback, _message, _embed) in reversed(
+                server.prepared_games.items()
+            )
+            if callback.__self__ is match
+        ),
+        None,
+    )
+
+
+async def play_match(
+    hc_tcg: FakeHcTcgServer,
+    server: Server,
+    recorder: Recorder,
+    best_of: int,
+    cancel_chance: float,
+    discord_latency: float,
+) -> None:
+    """Play a match from creation to the final game.
+
+    Args:
+    ----
+    hc_tcg (FakeHcTcgServer): The fake server running the games
+    server (Server): The bot's view of the server
+    recorder (Recorder): Where to record lifecycle latencies
+    best_of (int): The number of games in the match
+    cancel_chance (float): The chance of each private game being cancelled once
+    discord_latency (float): Seconds each discord call takes
+    """
+    match_start = perf_counter()
+    match = TimedMatch(None, FakeContext(discord_latency), server, best_of // 2 + 1)
+    await match.send_message()
+    match.players = ["1", "2"]
+    await match.start_game()
+
+    while match.state != MatchStateEnum.ENDED:
+        code = await match.codes.get()
+        if hc_tcg.random.random() < cancel_chance:
+            old_codes = set(server.prepared_games)
+            start = perf_counter()
+            await hc_tcg.send("private_cancel", private_cancel_payload(code))
+            while code in old_codes or code is None:
+                await sleep(0.001)
+                code = prepared_code(server, match)
+            recorder.add("match cancel", perf_counter() - start)
+
+        game_id = hc_tcg.new_game_id()
+        start = perf_counter()
+        await hc_tcg.start_game(game_id, code)
+        await match.wait_for_state(MatchStateEnum.PLAYING)
+        recorder.add("match game start", perf_counter() - start)
+
+        start = perf_counter()
+        await hc_tcg.end_game(game_id, code, hc_tcg.random.randrange(2))
+        await match.wait_for_state(
+            MatchStateEnum.STARTING_GAME, MatchStateEnum.ENDED
+        )
+        recorder.add("match game end", perf_counter() - start)
+    recorder.add("match total", perf_counter() - match_start)
+
+
+async def load_test(args: Any) -> None:  # noqa: ANN401
+    """Run the load test.
+
+    Args:
+    ----
+    args (Namespace): The command line arguments
+    """
+    recorder = Recorder()
+    bot_url = f"http://127.0.0.1:{args.bot_port}"
+    hc_tcg = FakeHcTcgServer(bot_url, recorder, args.seed)
+
+    web_server = Application()
+    server = Server(
+        "load-test", f"http://127.0.0.1:{args.server_port}", SERVER_KEY, "0", API_KEY
+    )
+    manager = ServerManager(
+        None,
+        [server],
+        web_server,
+        AsyncIOScheduler(),
+        {},
+        store_path=":memory:",
+        history_path=":memory:",
+        meta_path=None,
+        ratings_path=":memory:",
+    )
+
+    runners = [AppRunner(web_server), AppRunner(hc_tcg.app)]
+    for runner, port in zip(runners, (args.bot_port, args.server_port), strict=True):
+        await runner.setup()
+        await TCPSite(runner, "127.0.0.1", port).start()
+
+    limit = Semaphore(args.concurrency)
+
+    async def limited(delay: float, job: Any) -> None:  # noqa: ANN401
+        await sleep(delay)
+        async with limit:
+            await job
+
+    async def poll_games() -> None:
+        while hc_tcg.session is not None:
+            start = perf_counter()
+            await server.refresh_games()
+            recorder.add("poll /api/games", perf_counter() - start)
+            await sleep(1)
+
+    jobs = [
+        hc_tcg.public_game() for _ in range(args.games)
+    ] + [
+        play_match(
+            hc_tcg,
+            server,
+            recorder,
+            args.best_of,
+            args.cancel_chance,
+            args.discord_latency / 1000,
+        )
+        for _ in range(args.matches)
+    ]
+    hc_tcg.random.shuffle(jobs)
+
+    async with ClientSession() as session:
+        hc_tcg.session = session
+        poller = create_task(poll_games())
+        start = perf_counter()
+        await gather(
+            *(limited(i / args.rate, job) for i, job in enumerate(jobs)),
+        )
+        await manager.events.join()
+        elapsed = perf_counter() - start
+        hc_tcg.session = None
+        await poller
+
+    print(f"Finished {len(jobs)} games and matches in {elapsed:.2f}s")
+    recorder.report(elapsed)
+    print(f"Event queue: {manager.events.metrics()}")
+    print(f"Gauges: { {name: gauge() for name, gauge in manager.gauges.items()} }")
+
+    await manager.shutdown()
+    for runner in runners:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000, help="Public games")
+    parser.add_argument("--matches", type=int, default=50, help="Followed matches")
+    parser.add_argument("--best-of", type=int, default=3)
+    parser.add_argument("--cancel-chance", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=500, help="Jobs started per s")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--discord-latency", type=float, default=50, help="In ms")
+    parser.add_argument("--bot-port", type=int, default=8087)
+    parser.add_argument("--server-port", type=int, default=8088)
+    parser.add_argument("--seed", type=int, default=0)
+    run(load_test(parser.parse_args()))
@@ -0,0 +1,102 @@
+"""Realistic payloads sent by hc-tcg servers."""
+from time import time
+from typing import Optional
+
+CARD_IDS = [
+    "ethoslab_rare",
+    "xisumavoid_common",
+    "iron_sword",
+    "golden_apple",
+    "item_redstone_common",
+    "item_builder_rare",
+]
+
+
+def player_state(player_id: str, name: str) -> dict:
+    """Create the state of a player at the start of a game.
+
+    Args:
+    ----
+    player_id (str): The id of the player
+    name (str): The name of the player
+    """
+    cards = [{"cardId": CARD_IDS[i % len(CARD_IDS)]} for i in range(42)]
+    return {
+        "id": player_id,
+        "censoredPlayerName": name,
+        "minecraftName": name,
+        "lives": 3,
+        "pile": cards[7:],
+        "hand": cards[:7],
+        "discarded": [],
+        "board": {"activeRow": None, "rows": [], "singleUseCard": None},
+    }
+
+
+def game_start_payload(
+    game_id: str, code: Optional[str] = None, names: tuple[str, str] = ("Alice", "Bob")
+) -> dict:
+    """Create a game_start payload.
+
+    Args:
+    ----
+    game_id (str): The id of the game
+    code (str): Optional, the code of a private game
+    names (tuple): Optional, the names of the two players
+    """
+    player_ids = [f"{game_id}-a", f"{game_id}-b"]
+    return {
+        "createdTime": round(time() * 1000),
+        "id": game_id,
+        "code": code,
+        "playerIds": player_ids,
+        "playerNames": list(names),
+        "state": {
+            "players": {
+                player_id: player_state(player_id, name)
+                for player_id, name in zip(player_ids, names, strict=True)
+            }
+        },
+    }
+
+
+def game_end_payload(
+    game_id: str,
+    code: Optional[str] = None,
+    names: tuple[str, str] = ("Alice", "Bob"),
+    winner: int = 0,
+) -> dict:
+    """Create a game_end payload.
+
+    Args:
+    ----
+    game_id (str): The id of the game
+    code (str): Optional, the code of a private game
+    names (tuple): Optional, the names of the two players
+    winner (int): Optional, the index of the player that won
+    """
+    player_ids = [f"{game_id}-a", f"{game_id}-b"]
+    return {
+        "createdTime": round(time() * 1000) - 600000,
+        "id": game_id,
+        "code": code,
+        "playerIds": player_ids,
+        "playerNames": list(names),
+        "endInfo": {
+            "reason": "lives",
+            "winner": player_ids[winner],
+            "outcome": "player_won",
+            "deadPlayerIds": [player_ids[1 - winner]],
+        },
+        "endTime": round(time() * 1000),
+    }
+
+
+def private_cancel_payload(code: str) -> dict:
+    """Create a private_cancel payload.
+
+    Args:
+    ----
+    code (str): The code of the cancelled game
+    """
+    return {"code": code}
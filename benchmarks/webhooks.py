@@ -0,0 +1,97 @@
+"""Measure requests per second through the webhook endpoints.
+
+Run from the repository root with `python -m benchmarks.webhooks`.
+"""
+from argparse import ArgumentParser
+from asyncio import gather, run
+from json import dumps
+from time import perf_counter
+from timeit import timeit
+
+from aiohttp import ClientSession
+from aiohttp.web import Application, AppRunner, TCPSite
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from pyjson5 import decode as decode_json5
+
+from benchmarks.payloads import game_end_payload
+from util import GAME_END_SCHEMA, Server, ServerManager, parse_json
+
+API_KEY = "benchmark-key"
+
+
+def bench_parsing(iterations: int) -> None:
+    """Compare json5 decoding with the webhook parser.
+
+    Args:
+    ----
+    iterations (int): The number of payloads to decode
+    """
+    body = dumps(game_end_payload("game-0", "0a1b2c")).encode()
+    json5_time = timeit(lambda: decode_json5(body.decode()), number=iterations)
+    fast_time = timeit(
+        lambda: GAME_END_SCHEMA.validate(parse_json(body)), number=iterations
+    )
+    print(f"json5 decode:          {iterations / json5_time:>10.0f} payloads/s")
+    print(f"parse_json + validate: {iterations / fast_time:>10.0f} payloads/s")
+
+
+async def bench_requests(requests: int, concurrency: int, port: int) -> None:
+    """Send game_end requests to a local server and report requests per second.
+
+    Args:
+    ----
+    requests (int): The total number of requests to send
+    concurrency (int): The number of requests in flight at once
+    port (int): The port to run the local server on
+    """
+    web_server = Application()
+    server = Server("benchmark", "http://127.0.0.1:1", "", "0", API_KEY)
+    ServerManager(
+        None,
+        [server],
+        web_server,
+        AsyncIOScheduler(),
+        {},
+        store_path=":memory:",
+        history_path=":memory:",
+        meta_path=None,
+        ratings_path=":memory:",
+    )
+    runner = AppRunner(web_server)
+    await runner.setup()
+    await TCPSite(runner, "127.0.0.1", port).start()
+
+    bodies = [
+        dumps(game_end_payload(f"game-{game}", winner=game % 2)).encode()
+        for game in range(requests)
+    ]
+    url = f"http://127.0.0.1:{port}/admin/game_end"
+    async with ClientSession() as session:
+
+        async def worker(offset: int) -> None:
+            for body in bodies[offset::concurrency]:
+                async with session.post(
+                    url, data=body, headers={"api-key": API_KEY}
+                ) as response:
+                    response.raise_for_status()
+
+        start = perf_counter()
+        await gather(*(worker(offset) for offset in range(concurrency)))
+        elapsed = perf_counter() - start
+    await runner.cleanup()
+    print(
+        f"game_end webhook:      {requests / elapsed:>10.0f} requests/s "
+        f"({requests} requests, concurrency {concurrency})"
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8086)
+    args = parser.parse_args()
+
+    bench_parsing(args.iterations)
+    run(bench_requests(args.requests, args.concurrency, args.port))
@@ -53,27 +53,21 @@ class AdminExt(Extension):
         if not server.authorize_user(ctx.author):
             await ctx.send("You can't do that!", ephemeral=True)
 
-        data = server.get_games()
-        data.sort(key=lambda x: x.created)
+        snapshot = await server.get_snapshot()
+        if not snapshot.reachable:
+            await ctx.send("Couldn't reach the server, try again later", ephemeral=True)
+            return
         if search != "":
-            data = next(
-                (
-                    game
-                    for game in data
-                    if game.id == search
-                    or search in game.player_names
-                    or game.code == search
-                ),
-                None,
-            )
-            if not data:
+            game = snapshot.find(search)
+            if not game:
                 await ctx.send(
                     "Couldn't find that game, run without arguments to get all games",
                     ephemeral=True,
                 )
                 return
-            await ctx.send(embeds=data.generate_embed())
+            await ctx.send(embeds=game.generate_embed())
             return
+        data = snapshot.games
         embeds = []
         page_length = len(data) // 10 + (1 if len(data) % 10 > 0 else 0)
         for i in range(page_length):
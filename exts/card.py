@@ -4,7 +4,6 @@ from datetime import datetime as dt
 from datetime import timezone
 from io import BytesIO
 from itertools import islice
-from math import ceil, sqrt
 from re import compile as re_compile
 from time import time
 from typing import Iterable, Optional
@@ -28,17 +27,23 @@ from interactions import (
     slash_option,
     spread_to_rows,
 )
-from matplotlib import pyplot as plt
 from PIL import Image
 
 from util import (
     TYPE_COLORS,
     Card,
+    CardImages,
+    DeckValidator,
     EffectCard,
     HermitCard,
+    MetaStats,
+    deck_image,
     hash_to_deck,
     hash_to_stars,
-    probability,
+    hermit_chances,
+    hermit_chart,
+    hermit_types,
+    sort_deck,
 )
 
 
@@ -68,24 +73,32 @@ def count(s: str) -> str:
     return ", ".join(final) if len(final) else "None"
 
 
-def best_factors(number: int) -> tuple[int, int]:
-    """Get as close to being square as possible."""
-    x = sqrt(number) // 1
-    return ceil(x), ceil(x if number - x**2 == 0 else (number - x**2) / x + x)
-
-
 class CardExt(Extension):
 
     """Get information about cards and decks."""
 
-    def __init__(self: "CardExt", _: Client, universe: dict[str, Card]) -> None:
+    def __init__(
+        self: "CardExt",
+        _: Client,
+        universe: dict[str, Card],
+        meta: Optional[MetaStats] = None,
+        images: Optional[CardImages] = None,
+        exclude: Iterable[int] = (),
+    ) -> None:
         """Get information about cards and decks.
 
         Args:
         ----
         universe (dict): Dictionary that converts card ids to Card objects
+        meta (MetaStats): Optional, statistics about the cards used in games
+        images (CardImages): Optional, card images served by the web server,
+        linked to instead of uploading them
+        exclude (Iterable): Optional, numeric ids of cards that can't be used in decks
         """
         self.universe = universe
+        self.meta_stats = meta
+        self.images = images
+        self.validator = DeckValidator(universe, exclude=exclude)
         self.lastReload = time()
 
     def get_stats(
@@ -97,38 +110,12 @@ class CardExt(Extension):
         ----
         deck (list): List of card ids in the deck
         """
-        type_counts = {
-            "miner": 0,
-            "terraform": 0,
-            "speedrunner": 0,
-            "pvp": 0,
-            "builder": 0,
-            "balanced": 0,
-            "explorer": 0,
-            "prankster": 0,
-            "redstone": 0,
-            "farm": 0,
-        }
-        hermits, items, effects = ([] for _ in range(3))
-        for card in deck:
-            if card.text_id.startswith("item"):
-                items.append(card)
-            elif card.text_id.endswith(("rare", "common")):
-                hermits.append(card)
-                if card in self.universe.keys():
-                    type_counts[card.hermit_type] += 1
-            else:
-                effects.append(card)
-
-        hermits.sort(key=lambda x: x.numeric_id)
-        items.sort(key=lambda x: x.numeric_id)
-        effects.sort(key=lambda x: x.numeric_id)
-        width, height = best_factors(len(deck))
-        im = Image.new("RGBA", (width * 200, height * 200))
-        for i, card in enumerate(hermits + effects + items):
-            new_card = card.image.resize((200, 200)).convert("RGBA")
-            im.paste(new_card, ((i % width) * 200, (i // width) * 200), new_card)
-        return im, (len(hermits), len(effects), len(items)), type_counts
+        hermits, effects, items = sort_deck(deck)
+        return (
+            deck_image(deck),
+            (len(hermits), len(effects), len(items)),
+            hermit_types(hermits),
+        )
 
     @global_autocomplete("card_name")
     async def card_autocomplete(self: "CardExt", ctx: AutocompleteContext) -> None:
@@ -182,6 +169,7 @@ class CardExt(Extension):
             await ctx.send("Invalid deck: Perhaps you're looking for /card info")
             return
         im, card_type_counts, hermit_type_counts = self.get_stats(deck_list)
+        problems = self.validator.validate(deck_hash)
         col = TYPE_COLORS[Counter(hermit_type_counts).most_common()[0][0]]
 
         e = (
@@ -211,6 +199,13 @@ class CardExt(Extension):
                 ),
                 inline=True,
             )
+            .add_field(
+                "Legal",
+                "\n- ".join(["No", *(problem.message for problem in problems)])
+                if problems
+                else "Yes",
+                inline=False,
+            )
             .set_footer("Bot by Tyrannicodin16")
         )
         with BytesIO() as im_binary:
@@ -314,8 +309,13 @@ class CardExt(Extension):
                     if type(card) is not EffectCard
                     else rgb_to_int(beige),
                 ).add_field("Rarity", card.rarity, inline=True)
-            e.set_thumbnail(f"attachment://{card.text_id}.png")
             e.set_footer("Bot by Tyrannicodin16")
+            url = self.images and await self.images.url(card)
+            if url:
+                e.set_thumbnail(url)
+                await ctx.send(embeds=e)
+                return
+            e.set_thumbnail(f"attachment://{card.text_id}.png")
             with BytesIO() as im_binary:
                 card.image.save(im_binary, "PNG")
                 im_binary.seek(0)
@@ -368,19 +368,10 @@ class CardExt(Extension):
         if hermits < 1 or hermits > 36:
             await ctx.send("Invalid hermit count (1-36)", ephemeral=True)
             return
-        plt.figure()
-        xs = list(range(35))
-        ys = [probability(hermits, i, desired_hermits) * 100 for i in xs]
+        ys = hermit_chances(hermits, desired_hermits)
         surpass = next(
             (idx[0] for idx in enumerate(ys) if idx[1] >= desired_chance), None
         )
-        plt.plot(xs, list(ys))
-        plt.xlabel("Draws")
-        plt.ylabel("Probability")
-        plt.title(
-            f"Chance of having {desired_hermits} hermits in your hand after x draws for {hermits} hermits"  # noqa: E501
-        )
-        plt.grid(visible=True)
         e = Embed(
             title=f"Chance of having {desired_hermits} hermits in your hand after x draws for {hermits} hermits",  # noqa: E501
             timestamp=dt.now(tz=timezone.utc),
@@ -392,11 +383,47 @@ class CardExt(Extension):
             e.add_field(f"Hits {desired_chance}%", "Never", inline=True)
         e.set_footer("Bot by Tyrannicodin | Probability calculations by Allophony")
         e.set_image("attachment://graph.png")
-        with BytesIO() as figure_bytes:
-            plt.savefig(figure_bytes, format="png")
-            figure_bytes.seek(0)
+        graph = await hermit_chart(hermits, desired_hermits, desired_chance)
+        with BytesIO(graph) as figure_bytes:
             await ctx.send(embeds=e, files=File(figure_bytes, "graph.png"))
-        plt.close()
+
+    @card.subcommand()
+    async def meta(self: "CardExt", ctx: SlashContext) -> None:
+        """Get the most used cards, types and decks in recent games."""
+        stats = self.meta_stats
+        if stats is None or stats.decks == 0:
+            await ctx.send("No games have been recorded yet.", ephemeral=True)
+            return
+        e = Embed(
+            title="Meta report",
+            description=f"From {stats.games} games",
+            timestamp=dt.now(tz=timezone.utc),
+        ).set_footer("Bot by Tyrannicodin16")
+        e.add_field(
+            "Most used cards",
+            "\n".join(
+                f"{self.universe[card_id].rarityName}: {usage:.0%} of decks, "
+                f"{win_rate:.0%} wins"
+                for card_id, usage, win_rate in stats.card_stats(10)
+            ),
+        )
+        e.add_field(
+            "Types",
+            "\n".join(
+                f"{hermit_type.capitalize()}: {usage:.0%} of decks, {win_rate:.0%} wins"
+                for hermit_type, usage, win_rate in stats.type_stats()
+            ),
+        )
+        e.add_field(
+            "Popular decks",
+            "\n".join(
+                f"[{count} games, {wins / count:.0%} wins]"
+                f"(https://hc-tcg.fly.dev/?deck={quote(deck_hash)})"
+                for deck_hash, count, wins in stats.popular_decks.most_common(5)
+            )
+            or "None",
+        )
+        await ctx.send(embeds=e)
 
     @card.subcommand()
     async def chart(self: "CardExt", ctx: SlashContext) -> None:
@@ -1,28 +1,80 @@
 """Commands for recording dotd results."""
+from typing import Optional
+
 from interactions import (
+    AllowedMentions,
     Client,
     Extension,
     Member,
     OptionType,
     SlashContext,
-    User,
     slash_command,
     slash_option,
 )
+from interactions.ext.paginators import Paginator
 
-from util import ServerManager
+from util import DotdResult, DotdStore, ServerManager
 
 
 class DotdExt(Extension):
 
     """Commands for recording dotd results."""
 
-    def __init__(self: "DotdExt", client: Client, manager: ServerManager) -> None:
-        """Commands for recording dotd results."""
+    def __init__(
+        self: "DotdExt",
+        client: Client,
+        manager: ServerManager,
+        store_path: str = "dotd.db",
+    ) -> None:
+        """Commands for recording dotd results.
+
+        Args:
+        ----
+        client (Client): The discord bot client
+        manager (ServerManager): The manager for all servers the bot is in
+        store_path (str): Optional, the file dotd results are saved to
+        """
         self.client: Client = client
-        self.data: dict[int, tuple[int, int, int, int]] = {}
+        self.store = DotdStore(store_path)
         self.manager = manager
 
+    async def send_results(
+        self: "DotdExt", ctx: SlashContext, results: list[DotdResult]
+    ) -> None:
+        """Send a list of results with the names of the players.
+
+        Args:
+        ----
+        ctx (SlashContext): The command to reply to
+        results (list[DotdResult]): The results to list, best first
+        """
+        names = await self.manager.member_names(
+            str(ctx.guild_id), [result.user_id for result in results]
+        )
+        await self.send_lines(
+            ctx,
+            [
+                f"{i}. {names[result.user_id]} - {result.wins} wins, "
+                f"{result.ties} ties and {result.losses} losses"
+                for i, result in enumerate(results, 1)
+            ],
+        )
+
+    async def send_lines(self: "DotdExt", ctx: SlashContext, lines: list[str]) -> None:
+        """Send lines of text, paginating them if they don't fit in a message.
+
+        Args:
+        ----
+        ctx (SlashContext): The command to reply to
+        lines (list[str]): The lines to send
+        """
+        if sum(len(line) + 1 for line in lines) <= 2000:
+            await ctx.send("\n".join(lines))
+            return
+        await Paginator.create_from_list(
+            self.client, lines, page_size=1500, timeout=300
+        ).send(ctx)
+
     @slash_command()
     async def dotd(self: "DotdExt", _: SlashContext) -> None:
         """Commands for recording dotd results."""
@@ -41,11 +93,12 @@ class DotdExt(Extension):
         if wins > 5 or ties > 5 - wins or wins < 0 or ties < 0:
             await ctx.send("Invalid wins or ties", ephemeral=True)
             return
-        self.data[str(ctx.author_id)] = (
-            str(ctx.author_id),
-            wins,
-            ties,
-            5 - wins - ties,
+        self.store.submit(
+            str(ctx.guild_id),
+            DotdResult(str(ctx.author_id), wins, ties, 5 - wins - ties),
+        )
+        self.manager.members.set(
+            (str(ctx.guild_id), str(ctx.author_id)), ctx.author.display_name
         )
         await ctx.send(
             f"{ctx.author.display_name}: {wins} wins, {ties} ties and {5-wins-ties} losses"  # noqa: E501
@@ -72,7 +125,12 @@ class DotdExt(Extension):
         if wins > 5 or ties > 5 - wins or wins < 0 or ties < 0:
             await ctx.send("Invalid wins or ties", ephemeral=True)
             return
-        self.data[str(player.id)] = (str(player.id), wins, ties, 5 - wins - ties)
+        self.store.submit(
+            str(ctx.guild_id), DotdResult(str(player.id), wins, ties, 5 - wins - ties)
+        )
+        self.manager.members.set(
+            (str(ctx.guild_id), str(player.id)), player.display_name
+        )
         await ctx.send(
             f"{player.display_name}: {wins} wins, {ties} ties and {5-wins-ties} losses",
             ephemeral=True,
@@ -81,35 +139,111 @@ class DotdExt(Extension):
     @dotd.subcommand("list")
     async def list_results(self: "DotdExt", ctx: SlashContext) -> None:
         """List today's dotd results."""
-        reversed_data: dict[tuple[int, int, int, int], int] = {
-            value: key for key, value in self.data.items()
-        }
-        data_sorted: list[tuple[int, int, int, int]] = list(self.data.values())
-        data_sorted.sort(key=lambda x: (-x[1], -x[2]))
-        output: str = ""
-        for i, user in enumerate(data_sorted, 1):
-            discord_member: Member = await self.client.fetch_member(
-                reversed_data[user], ctx.guild_id
-            )
-            if not discord_member:
-                discord_member: User = await self.client.fetch_user(reversed_data[user])
-            output: str = f"{output}\n{i}. {discord_member.display_name} - {user[1]} wins, {user[2]} ties and {user[3]} losses"  # noqa: E501
-        if output:
-            await ctx.send(output)
-        else:
+        results = self.store.results(str(ctx.guild_id))
+        if not results:
             await ctx.send("No results submitted yet", ephemeral=True)
+            return
+        await self.send_results(ctx, results)
 
     @dotd.subcommand()
     async def clear(self: "DotdExt", ctx: SlashContext) -> None:
-        """Clear all results."""
+        """Finish today's dotd, saving and rating the results."""
         if ctx.member is None:
             await ctx.send("You can't do that!", ephemeral=True)
             return
         if not self.manager.discord_links[str(ctx.guild_id)].authorize_user(ctx.member):
             await ctx.send("You can't do that!", ephemeral=True)
             return
-        self.data: dict[int, tuple[int, int, int, int]] = {}
-        await ctx.send("Cleared all results")
+        results = self.store.close_event(str(ctx.guild_id))
+        self.manager.ratings.record_results(
+            f"dotd-{ctx.guild_id}",
+            [
+                (result.user_id, result.wins, result.ties, result.losses)
+                for result in results
+            ],
+        )
+        await ctx.send("Cleared all results, ratings have been updated")
+
+    @dotd.subcommand()
+    async def new_season(self: "DotdExt", ctx: SlashContext) -> None:
+        """Start a new dotd season, future events count towards its standings."""
+        if ctx.member is None:
+            await ctx.send("You can't do that!", ephemeral=True)
+            return
+        if not self.manager.discord_links[str(ctx.guild_id)].authorize_user(ctx.member):
+            await ctx.send("You can't do that!", ephemeral=True)
+            return
+        season = self.store.new_season(str(ctx.guild_id))
+        await ctx.send(f"Started season {season}")
+
+    @dotd.subcommand()
+    @slash_option("season", "The season to show, defaults to now", OptionType.INTEGER)
+    async def standings(
+        self: "DotdExt", ctx: SlashContext, season: Optional[int] = None
+    ) -> None:
+        """Get the players with the most wins this season."""
+        if season is None:
+            season = self.store.season(str(ctx.guild_id))
+        totals = self.store.standings(str(ctx.guild_id), season)
+        if not totals:
+            await ctx.send(f"No results in season {season} yet", ephemeral=True)
+            return
+        names = await self.manager.member_names(
+            str(ctx.guild_id), [total.user_id for total in totals]
+        )
+        await self.send_lines(
+            ctx,
+            [
+                f"Season {season} standings:",
+                *(
+                    f"{i}. {names[total.user_id]} - {total.wins} wins, "
+                    f"{total.ties} ties and {total.losses} losses in {total.events} "
+                    f"events (streak {total.streak}, best {total.best_streak})"
+                    for i, total in enumerate(totals, 1)
+                ),
+            ],
+        )
+
+    @dotd.subcommand()
+    @slash_option("event", "The event to show the results of", OptionType.INTEGER)
+    async def history(
+        self: "DotdExt", ctx: SlashContext, event: Optional[int] = None
+    ) -> None:
+        """Get past dotd events, or the results of one."""
+        if event is not None:
+            results = self.store.results(str(ctx.guild_id), event)
+            if not results:
+                await ctx.send("Couldn't find that event", ephemeral=True)
+                return
+            await self.send_results(ctx, results)
+            return
+        events = self.store.events(str(ctx.guild_id))
+        if not events:
+            await ctx.send("No dotd events have finished yet", ephemeral=True)
+            return
+        await ctx.send(
+            "\n".join(
+                f"Event {past.id} (season {past.season}) <t:{round(past.closed)}:d> - "
+                f"{past.players} players, won by <@{past.winner}>"
+                for past in events
+            ),
+            allowed_mentions=AllowedMentions.none(),
+        )
+
+    @dotd.subcommand()
+    async def leaderboard(self: "DotdExt", ctx: SlashContext) -> None:
+        """Get the highest rated dotd players."""
+        players = self.manager.ratings.leaderboard(f"dotd-{ctx.guild_id}")
+        if not players:
+            await ctx.send("No dotd results have been rated yet", ephemeral=True)
+            return
+        await ctx.send(
+            "\n".join(
+                f"{rank}. <@{player.name}> - {round(player.rating)}"
+                for rank, player in enumerate(players, 1)
+            ),
+            allowed_mentions=AllowedMentions.none(),
+        )
 
 
 def setup(client: Client, **kwargs: dict) -> Extension:
@@ -1,18 +1,23 @@
 """Commands to help manage forums."""
-from asyncio import sleep
-from collections import defaultdict
-from json import dump, load
+from asyncio import TimeoutError as AsyncTimeoutError
+from dataclasses import dataclass
+from typing import Optional
 
+from apscheduler.triggers.interval import IntervalTrigger
 from interactions import (
+    ActionRow,
     Button,
     ButtonStyle,
     Client,
     ComponentContext,
     Extension,
+    GuildForum,
     GuildForumPost,
+    Message,
     SlashContext,
     StringSelectMenu,
     StringSelectOption,
+    ThreadTag,
     component_callback,
     events,
     listen,
@@ -20,7 +25,7 @@ from interactions import (
     spread_to_rows,
 )
 
-from util import Server, ServerManager
+from util import BulkRunner, EditCoalescer, ForumStore, Server, ServerManager
 
 
 class DummyPost:
@@ -34,29 +39,162 @@ class DummyPost:
         self.channel = ctx.channel
 
 
+@dataclass
+class ForumTags:
+
+    """The tags of a tracked forum, sorted by how the bot uses them."""
+
+    open_tag: Optional[ThreadTag]
+    closed_tag: Optional[ThreadTag]
+    ignored: frozenset[int]
+    status: frozenset[int]
+    components: list[ActionRow]
+
+
 class ForumExt(Extension):
 
     """Commands to help manage forums."""
 
-    def __init__(self: "ForumExt", client: Client, manager: ServerManager) -> None:
+    def __init__(
+        self: "ForumExt",
+        client: Client,
+        manager: ServerManager,
+        store_path: str = "forums.db",
+    ) -> None:
         """Commands to help manage forums.
 
         Args:
         ----
         client (Client): The discord bot client
         manager (ServerManager): The manager for all servers the bot is in
+        store_path (str): Optional, the file posts waiting to be closed are saved to
         """
         self.client: Client = client
         self.manager: ServerManager = manager
-        self.to_close = defaultdict(list)
-        with open("forums.json") as f:
-            self.to_close.update(load(f))
+        self.to_close = ForumStore(store_path)
+        self.closing: bool = False
+        self.tags: dict[str, ForumTags] = {}
 
-    @listen()
-    async def disconnect(self: "ForumExt", _: str) -> None:
-        """Handle bot disconnection."""
-        with open("forums.json", "w") as f:
-            dump(self.to_close, f)
+        self.manager.scheduler.add_job(self.compact, IntervalTrigger(hours=1))
+
+    async def compact(self: "ForumExt") -> None:
+        """Truncate the store's write ahead log, on the thread that owns it."""
+        self.to_close.compact()
+
+    def forum_tags(self: "ForumExt", server: Server, forum: GuildForum) -> ForumTags:
+        """Get the tags of a tracked forum, building them the first time.
+
+        Args:
+        ----
+        server (Server): The server the forum is tracked by
+        forum (GuildForum): The forum
+        """
+        tags = self.tags.get(str(forum.id))
+        if tags is not None:
+            return tags
+        ignored_names = server.tracked_forums[str(forum.id)]
+        ignored = frozenset(
+            int(tag.id) for tag in forum.available_tags if tag.name in ignored_names
+        )
+        status = frozenset(
+            int(tag.id)
+            for tag in forum.available_tags
+            if tag.name.lower() in ("open", "closed")
+        )
+        tags = ForumTags(
+            forum.get_tag("open", case_insensitive=True),
+            forum.get_tag("closed", case_insensitive=True),
+            ignored,
+            status,
+            spread_to_rows(
+                StringSelectMenu(
+                    *(
+                        StringSelectOption(
+                            label=tag.name, value=tag.id, emoji=tag.emoji_name
+                        )
+                        for tag in forum.available_tags
+                        if int(tag.id) not in ignored and int(tag.id) not in status
+                    ),
+                    custom_id="post_tagged",
+                ),
+                Button(
+                    style=ButtonStyle.DANGER,
+                    label="Close thread",
+                    emoji=":wastebasket:",
+                    custom_id="close_thread",
+                ),
+            ),
+        )
+        self.tags[str(forum.id)] = tags
+        return tags
+
+    @listen("channel_update")
+    async def on_channel_update(self: "ForumExt", event: events.ChannelUpdate) -> None:
+        """Rebuild the tags of a forum when they might have changed."""
+        self.tags.pop(str(event.after.id), None)
+
+    @listen("startup")
+    async def resume_closing(self: "ForumExt") -> None:
+        """Finish closing posts if the bot stopped part way through."""
+        closing = self.to_close.closing()
+        if closing is None:
+            return
+        channel = await self.client.fetch_channel(closing[0])
+        status = channel and await channel.fetch_message(closing[1])
+        if status is None:
+            self.to_close.finish_closing()
+            return
+        await self.close_posts(status)
+
+    async def archive_post(self: "ForumExt", post: tuple[str, str]) -> None:
+        """Archive and lock a post.
+
+        Args:
+        ----
+        post (tuple[str, str]): The id of the forum and the id of the post
+        """
+        thread = await self.client.fetch_channel(post[1])
+        if thread:
+            await thread.archive(locked=True)
+
+    async def close_posts(self: "ForumExt", status: Message) -> None:
+        """Close every post waiting to be closed, showing progress in `status`.
+
+        Posts are forgotten as they are closed, so a restart picks up where it
+        left off.
+
+        Args:
+        ----
+        status (Message): The message to show progress in
+        """
+        self.closing = True
+        self.to_close.start_closing(str(status.channel.id), str(status.id))
+        posts = self.to_close.snapshot()
+
+        async def show_progress() -> None:
+            await status.edit(
+                content=f"Closing posts: {runner.finished}/{runner.total}"
+            )
+
+        editor = EditCoalescer(show_progress)
+
+        def on_progress(post: tuple[str, str], closed: bool) -> None:  # noqa: FBT001
+            if closed:  # Failed posts are tried again next time
+                self.to_close.remove(post[1])
+            editor.request()
+
+        runner = BulkRunner(self.archive_post, on_progress)
+        try:
+            await runner.run(posts)
+            await editor.flush()
+        finally:
+            self.closing = False
+        self.to_close.finish_closing()
+        self.to_close.compact()
+        await status.edit(
+            content=f"Closed {runner.done} posts"
+            + (f", {runner.failed} couldn't be closed" if runner.failed else "")
+        )
 
     @slash_command()
     async def forum(self: "ForumExt", _: SlashContext) -> None:
@@ -71,14 +209,16 @@ class ForumExt(Extension):
         if not self.manager.discord_links[str(ctx.guild_id)].authorize_user(ctx.member):
             await ctx.send("You can't do that!", ephemeral=True)
             return
-        for parent, threads in self.to_close.items():
-            parent_channel = await self.client.fetch_channel(parent)
-            for thread_id in threads:
-                thread = await parent_channel.fetch_post(thread_id)
-                if thread:
-                    await thread.archive(locked=True)
-        self.to_close = defaultdict(list)
-        await ctx.send("Closed all posts", ephemeral=True)
+        if self.closing:
+            await ctx.send("Already closing posts", ephemeral=True)
+            return
+        self.closing = True  # Before awaiting, so a second command sees it
+        try:
+            await ctx.send("Closing posts", ephemeral=True)
+            status = await ctx.channel.send("Closing posts")
+            await self.close_posts(status)
+        finally:
+            self.closing = False
 
     @forum.subcommand()
     async def manual(self: "ForumExt", ctx: SlashContext) -> None:
@@ -102,40 +242,22 @@ class ForumExt(Extension):
         server: Server = self.manager.discord_links[str(thread.guild.id)]
         if str(thread.parent_id) not in server.tracked_forums.keys():
             return
-        await sleep(1)
+        if not isinstance(event, DummyPost) and thread.initial_post is None:
+            try:  # The post can't be replied to until its first message exists
+                await self.client.wait_for(
+                    "message_create",
+                    checks=lambda e: e.message.id == thread.id,
+                    timeout=5,
+                )
+            except AsyncTimeoutError:
+                pass
+        tags = self.forum_tags(server, thread.parent_channel)
         await thread.join()
-        final_tags = [
-            tag
-            for tag in thread.applied_tags
-            if tag.name in server.tracked_forums[str(thread.parent_id)]
-        ]
-        open_tag = thread.parent_channel.get_tag("open", case_insensitive=True)
-        if open_tag:
-            final_tags.append(open_tag)
+        final_tags = [tag for tag in thread.applied_tags if int(tag.id) in tags.ignored]
+        if tags.open_tag:
+            final_tags.append(tags.open_tag)
         await thread.edit(applied_tags=final_tags)
-        select_option = []
-        for tag in thread.parent_channel.available_tags:
-            if not (
-                tag.name in server.tracked_forums[str(thread.parent_id)]
-                or tag.name.lower() in ["open", "closed"]
-            ):
-                select_option.append(
-                    StringSelectOption(
-                        label=tag.name, value=tag.id, emoji=tag.emoji_name
-                    )
-                )
-        await thread.send(
-            "Thanks for submitting a post",
-            components=spread_to_rows(
-                StringSelectMenu(*select_option, custom_id="post_tagged"),
-                Button(
-                    style=ButtonStyle.DANGER,
-                    label="Close thread",
-                    emoji=":wastebasket:",
-                    custom_id="close_thread",
-                ),
-            ),
-        )
+        await thread.send("Thanks for submitting a post", components=tags.components)
 
     @component_callback("post_tagged")
     async def change_tags(self: "ForumExt", ctx: ComponentContext) -> None:
@@ -156,12 +278,12 @@ class ForumExt(Extension):
             await ctx.send("You can't do that!", ephemeral=True)
             return
         post: GuildForumPost = ctx.channel
+        tags = self.forum_tags(server, post.parent_channel)
         selected_tag = post.parent_channel.get_tag(ctx.values[0])
         final_tags = [
             tag
             for tag in post.applied_tags
-            if tag.name in server.tracked_forums[str(post.parent_id)]
-            or tag.name in ["open", "closed"]
+            if int(tag.id) in tags.ignored or int(tag.id) in tags.status
         ]
         if selected_tag in final_tags:
             final_tags.remove(selected_tag)
@@ -189,17 +311,15 @@ class ForumExt(Extension):
         ):
             await ctx.send("You can't do that!", ephemeral=True)
             return
+        tags = self.forum_tags(server, ctx.channel.parent_channel)
         final_tags = [
-            tag
-            for tag in ctx.channel.applied_tags
-            if tag.name not in ["open", "closed"]
+            tag for tag in ctx.channel.applied_tags if int(tag.id) not in tags.status
         ]
-        closed_tag = ctx.channel.parent_channel.get_tag("closed", case_insensitive=True)
-        if closed_tag:
-            final_tags.append(closed_tag)
+        if tags.closed_tag:
+            final_tags.append(tags.closed_tag)
         await ctx.send("Closed post")
         await ctx.channel.edit(locked=True, applied_tags=final_tags)
-        self.to_close[ctx.channel.parent_id].append(ctx.channel_id)
+        self.to_close.add(str(ctx.channel.parent_id), str(ctx.channel_id))
 
 
 def setup(client: Client, **kwargs: dict) -> Extension:
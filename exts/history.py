@@ -0,0 +1,164 @@
+"""Commands for searching past games."""
+from datetime import datetime as dt
+from datetime import timezone
+
+from interactions import (
+    Client,
+    Embed,
+    Extension,
+    OptionType,
+    SlashContext,
+    slash_command,
+    slash_option,
+)
+
+from util import GameResult, Server, ServerManager
+
+RESULT_TEXT = {1: "beat", 0: "tied with", -1: "lost to"}
+
+
+class HistoryExt(Extension):
+
+    """Commands for searching past games."""
+
+    def __init__(self: "HistoryExt", client: Client, manager: ServerManager) -> None:
+        """Commands for searching past games.
+
+        Args:
+        ----
+        client (Client): The discord bot client
+        manager (ServerManager): The manager for all servers the bot is in
+        """
+        self.client: Client = client
+        self.manager: ServerManager = manager
+
+    @slash_command()
+    async def history(self: "HistoryExt", _: SlashContext) -> None:
+        """Commands for searching past games."""
+
+    @staticmethod
+    def describe(game: GameResult) -> str:
+        """Describe a game in one line.
+
+        Args:
+        ----
+        game (GameResult): The game to describe
+        """
+        ended = round(game.ended / 1000)
+        opponent = game.opponent or "someone"
+        return f"{game.name} {RESULT_TEXT[game.result]} {opponent} <t:{ended}:R>"
+
+    @history.subcommand()
+    @slash_option("player", "The first player", OptionType.STRING, required=True)
+    @slash_option("opponent", "The second player", OptionType.STRING, required=True)
+    async def head_to_head(
+        self: "HistoryExt", ctx: SlashContext, player: str, opponent: str
+    ) -> None:
+        """Get the record between two players."""
+        if str(ctx.guild_id) not in self.manager.discord_links.keys():
+            await ctx.send(
+                "Couldn't find an online server for this discord!", ephemeral=True
+            )
+            return
+        server: Server = self.manager.discord_links[str(ctx.guild_id)]
+
+        record = await self.manager.history.head_to_head(
+            server.server_id, player, opponent
+        )
+        if record.total == 0:
+            await ctx.send(
+                f"{player} and {opponent} haven't played each other.", ephemeral=True
+            )
+            return
+        e = Embed(
+            title=f"{player} vs {opponent}",
+            description=f"{record.wins} wins, {record.ties} ties and "
+            f"{record.losses} losses in {record.total} games",
+            timestamp=dt.now(tz=timezone.utc),
+        ).set_footer("Bot by Tyrannicodin16")
+        await ctx.send(embeds=e)
+
+    @history.subcommand()
+    @slash_option("player", "Only show games this player played", OptionType.STRING)
+    async def recent(
+        self: "HistoryExt", ctx: SlashContext, player: str = ""
+    ) -> None:
+        """Get the most recent games on the server."""
+        if str(ctx.guild_id) not in self.manager.discord_links.keys():
+            await ctx.send(
+                "Couldn't find an online server for this discord!", ephemeral=True
+            )
+            return
+        server: Server = self.manager.discord_links[str(ctx.guild_id)]
+
+        games = await self.manager.history.recent(server.server_id, player or None)
+        if not games:
+            await ctx.send("No games have been recorded yet.", ephemeral=True)
+            return
+        e = Embed(
+            title=f"Recent games{f' for {player}' if player else ''}",
+            description="\n".join(self.describe(game) for game in games),
+            timestamp=dt.now(tz=timezone.utc),
+        ).set_footer("Bot by Tyrannicodin16")
+        await ctx.send(embeds=e)
+
+    @history.subcommand()
+    @slash_option("page", "The page of the leaderboard to show", OptionType.INTEGER)
+    async def leaderboard(self: "HistoryExt", ctx: SlashContext, page: int = 1) -> None:
+        """Get the highest rated players on the server."""
+        if str(ctx.guild_id) not in self.manager.discord_links.keys():
+            await ctx.send(
+                "Couldn't find an online server for this discord!", ephemeral=True
+            )
+            return
+        server: Server = self.manager.discord_links[str(ctx.guild_id)]
+
+        start = (max(page, 1) - 1) * 10
+        players = self.manager.ratings.leaderboard(server.server_id, start)
+        if not players:
+            await ctx.send("No players on that page.", ephemeral=True)
+            return
+        pages = -(-self.manager.ratings.size(server.server_id) // 10)
+        e = Embed(
+            title=f"Leaderboard (page {max(page, 1)} of {pages})",
+            description="\n".join(
+                f"{rank}. {player.name} - {round(player.rating)} "
+                f"({player.wins}/{player.games} wins)"
+                for rank, player in enumerate(players, start + 1)
+            ),
+            timestamp=dt.now(tz=timezone.utc),
+        ).set_footer("Bot by Tyrannicodin16")
+        await ctx.send(embeds=e)
+
+    @history.subcommand()
+    @slash_option("player", "The player to get", OptionType.STRING, required=True)
+    async def rating(self: "HistoryExt", ctx: SlashContext, player: str) -> None:
+        """Get the rating of a player."""
+        if str(ctx.guild_id) not in self.manager.discord_links.keys():
+            await ctx.send(
+                "Couldn't find an online server for this discord!", ephemeral=True
+            )
+            return
+        server: Server = self.manager.discord_links[str(ctx.guild_id)]
+
+        rating = self.manager.ratings.get(server.server_id, player)
+        if rating is None:
+            await ctx.send(f"{player} hasn't played any games.", ephemeral=True)
+            return
+        rank = self.manager.ratings.rank(server.server_id, player)
+        await ctx.send(
+            f"{rating.name} is rated {round(rating.rating)}, rank {rank} of "
+            f"{self.manager.ratings.size(server.server_id)} "
+            f"({rating.wins}/{rating.games} wins)"
+        )
+
+
+def setup(client: Client, **kwargs: dict) -> Extension:
+    """Create the extension.
+
+    Args:
+    ----
+    client (Client): The discord client
+    **kwargs (dict): Dictionary containing additional arguments
+    """
+    return HistoryExt(client, **kwargs)
@@ -1,5 +1,8 @@
 """Commands for matches."""
+from asyncio import gather
+from time import monotonic
 
+from apscheduler.triggers.interval import IntervalTrigger
 from interactions import (
     Client,
     ComponentContext,
@@ -8,28 +11,166 @@ from interactions import (
     OptionType,
     SlashContext,
     component_callback,
+    errors,
+    events,
+    listen,
     slash_command,
     slash_option,
 )
 
-from util import Match, MatchStateEnum, Server, ServerManager
+from util import (
+    FollowedRecord,
+    Game,
+    Match,
+    MatchRecord,
+    MatchStateEnum,
+    PreparedRecord,
+    Server,
+    ServerManager,
+)
 
 
 class MatchExt(Extension):
 
     """Commands for creating matches."""
 
-    def __init__(self: "MatchExt", client: Client, manager: ServerManager) -> None:
+    def __init__(
+        self: "MatchExt",
+        client: Client,
+        manager: ServerManager,
+        match_ttl: float = 24 * 60 * 60,
+    ) -> None:
         """Commands linked to the administration of a server.
 
         Args:
         ----
         client (Client): The discord bot client
         manager (ServerManager): The manager for all servers the bot is in
+        match_ttl (float): Optional, seconds a match can go without changing state
+        before it is forgotten
         """
         self.client: Client = client
         self.manager: ServerManager = manager
+        self.match_ttl: float = match_ttl
         self.games: dict[str, Match] = {}
+        self.threads: dict[str, Match] = {}
+
+        self.manager.gauges["matches"] = lambda: len(self.games)
+        self.manager.scheduler.add_job(self.sweep, IntervalTrigger(minutes=10))
+
+    def forget_match(self: "MatchExt", match: Match) -> None:
+        """Stop tracking a match and the codes and games it is waiting for.
+
+        Args:
+        ----
+        match (Match): The match to forget
+        """
+        self.games.pop(match.id, None)
+        self.threads.pop(str(match.thread.id), None)
+        match.server.release_match(match.id)
+        self.manager.match_store.delete(match.id)
+
+    def track_match(self: "MatchExt", match: Match) -> None:
+        """Start tracking a match.
+
+        Args:
+        ----
+        match (Match): The match to track
+        """
+        self.games[match.id] = match
+        self.threads[str(match.thread.id)] = match
+
+    async def restore_match(
+        self: "MatchExt",
+        record: MatchRecord,
+        prepared: list[PreparedRecord],
+        followed: list[FollowedRecord],
+    ) -> None:
+        """Rebuild a saved match, dropping it if its message or thread is gone.
+
+        Args:
+        ----
+        record (MatchRecord): The saved match
+        prepared (list[PreparedRecord]): The game codes the match is waiting for
+        followed (list[FollowedRecord]): The games the match is following
+        """
+        server = self.manager.discord_links.get(record.guild_id)
+        try:
+            channel = await self.client.fetch_channel(record.channel_id)
+            message = channel and await channel.fetch_message(record.id)
+            thread = await self.client.fetch_channel(record.thread_id)
+        except errors.HTTPException:
+            message = thread = None
+        if server is None or message is None or thread is None:
+            self.manager.match_store.delete(record.id)
+            return
+
+        match = Match.restore(
+            self.client, server, record, message, thread, on_end=self.forget_match
+        )
+        self.track_match(match)
+        for code in prepared:
+            try:
+                game_message = await thread.fetch_message(code.message_id)
+            except errors.HTTPException:
+                game_message = None
+            if game_message is None or not game_message.embeds:
+                server.unprepare_game(code.code)
+                continue
+            server.prepare_game(
+                code.code, match.handle_game_start, game_message, game_message.embeds[0]
+            )
+        for game in followed:
+            match.game = Game(
+                {
+                    "state": {"players": {}},
+                    "playerIds": [],
+                    "id": game.game_id,
+                    "code": game.code,
+                    "createdTime": game.created_time,
+                },
+                server.universe,
+            )
+            match.game.end_callback = match.handle_game_end
+            server.follow_game(match.game)
+
+    @listen("startup")
+    async def on_startup(self: "MatchExt") -> None:
+        """Restore matches that were running when the bot last stopped."""
+        matches, prepared, followed = self.manager.match_store.load()
+        results = await gather(
+            *(
+                self.restore_match(
+                    record,
+                    [code for code in prepared if code.match_id == record.id],
+                    [game for game in followed if game.match_id == record.id],
+                )
+                for record in matches
+            ),
+            return_exceptions=True,
+        )
+        for record, result in zip(matches, results, strict=True):
+            if isinstance(result, Exception):
+                print(f"Failed to restore match {record.id}: {result!r}")
+
+    async def sweep(self: "MatchExt") -> None:
+        """Forget matches that haven't changed state for `match_ttl` seconds.
+
+        Saved matches older than that are dropped too, and the store is compacted.
+        """
+        cutoff = monotonic() - self.match_ttl
+        for match in [
+            match for match in self.games.values() if match.last_active < cutoff
+        ]:
+            self.forget_match(match)
+        self.manager.match_store.compact(self.match_ttl)
+
+    @listen("thread_delete")
+    async def on_thread_delete(self: "MatchExt", event: events.ThreadDelete) -> None:
+        """Forget a match if its thread is deleted."""
+        match = self.threads.get(str(event.thread.id))
+        if match is not None:
+            self.forget_match(match)
 
     @slash_command()
     @slash_option(
@@ -68,9 +209,11 @@ class MatchExt(Extension):
             server,
             best_of + 1 if play_all else best_of // 2 + 1,
             best_of if play_all else 100,
+            on_end=self.forget_match,
         )
         await new_match.send_message()
-        self.games[new_match.id] = new_match
+        self.track_match(new_match)
+        new_match.persist()
 
     @component_callback("join_game")
     async def join_game(self: "MatchExt", ctx: ComponentContext) -> None:
@@ -86,6 +229,7 @@ class MatchExt(Extension):
             await ctx.send("You can't join this game.", ephemeral=True)
             return
         target_match.players.append(str(ctx.author_id))
+        target_match.persist()
         await target_match.thread.add_member(ctx.author)
         await ctx.send("Joined game.", ephemeral=True)
 
@@ -103,5 +247,6 @@ class MatchExt(Extension):
             await ctx.send("You aren't in this game.", ephemeral=True)
             return
         target_match.players.remove(str(ctx.author_id))
+        target_match.persist()
         await target_match.thread.remove_member(ctx.author)
         await ctx.send("Left game", ephemeral=True)
@@ -1,5 +1,13 @@
 """Commands for the bot."""
-from interactions import Client, Extension, SlashContext, Status, slash_command
+from interactions import (
+    Client,
+    Extension,
+    SlashContext,
+    Status,
+    events,
+    listen,
+    slash_command,
+)
 
 from util.server import ServerManager
 
@@ -13,6 +21,21 @@ class UtilExt(Extension):
         self.client: Client = client
         self.manager: ServerManager = manager
 
+    @listen("message_create")
+    async def on_message(self: "UtilExt", event: events.MessageCreate) -> None:
+        """Add messages sent in update channels to the updates endpoint."""
+        await self.manager.on_message(event.message)
+
+    @listen("message_update")
+    async def on_message_update(self: "UtilExt", event: events.MessageUpdate) -> None:
+        """Reformat updates that were edited."""
+        await self.manager.on_message_update(event.after)
+
+    @listen("message_delete")
+    async def on_message_delete(self: "UtilExt", event: events.MessageDelete) -> None:
+        """Remove updates that were deleted."""
+        self.manager.on_message_delete(int(event.message.id))
+
     @slash_command()
     async def util(self: "UtilExt", _: SlashContext) -> None:
         """Commands for the bot."""
@@ -31,13 +54,13 @@ class UtilExt(Extension):
             server = self.manager.server_links[ctx.guild_id]
         except KeyError:
             if ctx.author_id == self.client.owner.id:
-                await self.manager.update_announcements()
+                await self.manager.update_announcements(full=True)
                 await ctx.send("Updated updates.")
             else:
                 await ctx.send("You aren't allow to do this.", ephemeral=True)
             return
         if server.authorize_user(ctx.author):
-            await self.manager.update_announcements()
+            await self.manager.update_announcements(full=True)
             await ctx.send("Updated updates.", ephemeral=True)
         else:
             await ctx.send("You aren't allow to do this.", ephemeral=True)
@@ -5,12 +5,13 @@ from os import listdir
 from pickle import UnpicklingError
 from pickle import load as pklload
 from time import time
+from typing import Optional
 
 from aiohttp.web import Application, AppRunner, TCPSite
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from interactions import Client, Intents, listen
 
-from util import DataGenerator, ServerManager
+from util import CardImages, DataGenerator, DeckPreviews, ServerManager
 
 start = time()
 with open("config.json") as f:
@@ -21,6 +22,13 @@ class Bot(Client):
 
     """Slightly modified discord client."""
 
+    async def astart(self: "Bot", token: Optional[str] = None) -> None:
+        """Run the bot, closing the stores once it stops."""
+        try:
+            await super().astart(token)
+        finally:
+            await server_manager.shutdown()
+
     @listen()
     async def on_ready(self: "Bot") -> None:
         """Handle bot starting."""
@@ -38,6 +46,7 @@ class Bot(Client):
     async def on_disconnect(self: "Bot") -> None:
         """Handle bot disconnection."""
         await runner.cleanup()
+        await server_manager.close()
         scheduler.shutdown()
 
 
@@ -64,11 +73,21 @@ servers = []
 for file in listdir("servers"):
     servers.append(import_module(f"servers.{file}").server)
 server_manager = ServerManager(bot, servers, web_server, scheduler, data_gen.universe)
+card_images = CardImages(data_gen.universe, web_server, CONFIG.get("public_url"))
+DeckPreviews(data_gen.universe, web_server, exclude=data_gen.exclude)
 
 bot.load_extension("exts.admin", None, manager=server_manager)
-bot.load_extension("exts.card", None, universe=data_gen.universe)
+bot.load_extension(
+    "exts.card",
+    None,
+    universe=data_gen.universe,
+    meta=server_manager.meta,
+    images=card_images,
+    exclude=data_gen.exclude,
+)
 bot.load_extension("exts.dotd", None, manager=server_manager)
 bot.load_extension("exts.forums", None, manager=server_manager)
+bot.load_extension("exts.history", None, manager=server_manager)
 bot.load_extension("exts.match", None, manager=server_manager)
 bot.load_extension("exts.util", None, manager=server_manager)
 
@@ -1,5 +1,21 @@
 """Utility function for the bot to use."""
+from .api import *
+from .bulk import *
+from .cache import *
+from .card_images import *
+from .charts import *
 from .datagen import *
 from .deck import *
+from .deck_previews import *
+from .dotd_store import *
+from .edits import *
+from .events import *
+from .forum_store import *
+from .history import *
+from .match_store import *
+from .meta import *
 from .probability import *
+from .ratings import *
+from .responses import *
 from .server import *
+from .webhooks import *
@@ -0,0 +1,87 @@
+"""Async http client used to talk to hc-tcg servers."""
+from asyncio import Semaphore
+from asyncio import TimeoutError as AsyncTimeoutError
+from typing import Optional, Union
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+
+
+class ApiClient:
+
+    """A pooled http client shared between all hc-tcg servers."""
+
+    def __init__(
+        self: "ApiClient",
+        connection_limit: int = 100,
+        server_limit: int = 4,
+        keepalive: float = 60,
+        timeout: float = 20,
+    ) -> None:
+        """Create the client, the session is only opened on the first request.
+
+        Args:
+        ----
+        connection_limit (int): Maximum number of open connections
+        server_limit (int): Maximum number of concurrent requests to one server
+        keepalive (float): Seconds to keep idle connections open for
+        timeout (float): Default total timeout for a request in seconds
+        """
+        self.connection_limit: int = connection_limit
+        self.server_limit: int = server_limit
+        self.keepalive: float = keepalive
+        self.timeout: float = timeout
+
+        self._session: Optional[ClientSession] = None
+        self._limits: dict[str, Semaphore] = {}
+
+    @property
+    def session(self: "ApiClient") -> ClientSession:
+        """The shared session, created inside the running event loop."""
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=TCPConnector(
+                    limit=self.connection_limit, keepalive_timeout=self.keepalive
+                ),
+                timeout=ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def request(
+        self: "ApiClient",
+        method: str,
+        api_url: str,
+        endpoint: str,
+        key: str,
+        timeout: Optional[float] = None,
+    ) -> Optional[Union[dict, list]]:
+        """Send a request to a server api and decode the json response.
+
+        Returns None if the server could not be reached or sent invalid json.
+
+        Args:
+        ----
+        method (str): The http method to use
+        api_url (str): The base api url of the server
+        endpoint (str): The endpoint to request, relative to `api_url`
+        key (str): The api key to send to the server
+        timeout (float): Optional, total timeout for this request in seconds
+        """
+        if api_url not in self._limits:
+            self._limits[api_url] = Semaphore(self.server_limit)
+        try:
+            async with self._limits[api_url], self.session.request(
+                method,
+                f"{api_url}/{endpoint}",
+                headers={"api-key": key},
+                timeout=ClientTimeout(total=timeout or self.timeout),
+            ) as response:
+                return await response.json(content_type=None)
+        except (ClientError, AsyncTimeoutError, ValueError) as e:
+            print(f"Request to {api_url}/{endpoint} failed: {e!r}")
+            return None
+
+    async def close(self: "ApiClient") -> None:
+        """Close the shared session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,129 @@
+"""Run one operation over many items a few at a time."""
+from asyncio import CancelledError, Queue, create_task, gather, sleep
+from typing import Awaitable, Callable, Generic, Iterable, Optional, TypeVar
+
+from interactions.client.errors import HTTPException
+
+from .events import is_transient
+
+T = TypeVar("T")
+
+
+class BulkRunner(Generic[T]):
+
+    """Process items with a fixed number of workers, retrying transient failures.
+
+    Requests go through the client's per-route rate limit buckets, the workers only
+    keep a bounded number in flight so one bulk job can't take every bucket. When a
+    request is rate limited anyway the worker waits for as long as discord asks.
+    """
+
+    def __init__(
+        self: "BulkRunner",
+        operation: Callable[[T], Awaitable[None]],
+        on_progress: Optional[Callable[[T, bool], None]] = None,
+        workers: int = 5,
+        max_retries: int = 3,
+        retry_delay: float = 1,
+    ) -> None:
+        """Create a runner.
+
+        Args:
+        ----
+        operation (Callable): The coroutine function to run for each item
+        on_progress (Callable): Optional, called with each item and whether it
+        succeeded once it is finished
+        workers (int): Optional, the number of items processed at once
+        max_retries (int): Optional, how many times to retry a failed item
+        retry_delay (float): Optional, seconds to wait before the first retry,
+        doubling after
+        """
+        self.operation: Callable[[T], Awaitable[None]] = operation
+        self.on_progress: Optional[Callable[[T, bool], None]] = on_progress
+        self.workers: int = workers
+        self.max_retries: int = max_retries
+        self.retry_delay: float = retry_delay
+
+        self.total: int = 0
+        self.done: int = 0
+        self.failed: int = 0
+
+    async def run(self: "BulkRunner", items: Iterable[T]) -> None:
+        """Process every item, returning once they are all finished.
+
+        Args:
+        ----
+        items (Iterable): The items to process
+        """
+        queue: Queue = Queue()
+        for item in items:
+            queue.put_nowait(item)
+        self.total += queue.qsize()
+        tasks = [
+            create_task(self.worker(queue))
+            for _ in range(min(self.workers, queue.qsize()))
+        ]
+        try:
+            await gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def worker(self: "BulkRunner", queue: Queue) -> None:
+        """Process items until the queue is empty.
+
+        Args:
+        ----
+        queue (Queue): The items waiting to be processed
+        """
+        while not queue.empty():
+            item = queue.get_nowait()
+            succeeded = await self.process(item)
+            if succeeded:
+                self.done += 1
+            else:
+                self.failed += 1
+            if self.on_progress is not None:
+                self.on_progress(item, succeeded)
+
+    async def process(self: "BulkRunner", item: T) -> bool:
+        """Run the operation on one item, returning whether it succeeded.
+
+        Args:
+        ----
+        item (T): The item to process
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.operation(item)
+            except CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                if attempt < self.max_retries and is_transient(e):
+                    delay = self.retry_delay * 2**attempt
+                    if isinstance(e, HTTPException) and e.status == 429:
+                        delay = max(delay, retry_after(e))
+                    await sleep(delay)
+                    continue
+                print(f"Failed to process {item!r}: {e!r}")
+                return False
+            return True
+        return False
+
+    @property
+    def finished(self: "BulkRunner") -> int:
+        """The number of items processed, successfully or not."""
+        return self.done + self.failed
+
+
+def retry_after(error: HTTPException) -> float:
+    """Get how long discord asked to wait before retrying a rate limited request.
+
+    Args:
+    ----
+    error (HTTPException): The rate limit error
+    """
+    try:
+        return float(error.response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0
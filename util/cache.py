@@ -0,0 +1,68 @@
+"""Small in-memory caches."""
+from collections import OrderedDict
+from collections.abc import Hashable
+from time import monotonic
+from typing import Any, Optional
+
+
+class TTLCache:
+
+    """A size bounded cache whose entries expire after a number of seconds."""
+
+    def __init__(self: "TTLCache", ttl: float, max_size: int = 1024) -> None:
+        """Create an empty cache.
+
+        Args:
+        ----
+        ttl (float): Seconds an entry is kept for
+        max_size (int): Optional, the number of entries kept before the least
+        recently used are removed
+        """
+        self.ttl: float = ttl
+        self.max_size: int = max_size
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self: "TTLCache", key: Hashable) -> Optional[Any]:  # noqa: ANN401
+        """Get an entry, or None if it is missing or expired.
+
+        Args:
+        ----
+        key (Hashable): The key of the entry
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self: "TTLCache", key: Hashable, value: Any) -> None:  # noqa: ANN401
+        """Add or replace an entry.
+
+        Args:
+        ----
+        key (Hashable): The key of the entry
+        value (Any): The value to store
+        """
+        self.entries[key] = (monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def pop(self: "TTLCache", key: Hashable) -> Optional[Any]:  # noqa: ANN401
+        """Remove an entry and return it, or None if it is missing or expired.
+
+        Args:
+        ----
+        key (Hashable): The key of the entry
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None or entry[0] < monotonic():
+            return None
+        return entry[1]
+
+    def __len__(self: "TTLCache") -> int:
+        """Get the number of stored entries, including expired ones."""
+        return len(self.entries)
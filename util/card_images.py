@@ -0,0 +1,124 @@
+"""Serve card images from the bot's web server."""
+from asyncio import Future, get_running_loop
+from io import BytesIO
+from typing import Optional
+
+from aiohttp.web import Application, Request, Response
+from aiohttp.web import get as get_route
+
+from .datagen import Card
+from .responses import CachedBody
+
+VERSIONED_CACHE = "public, max-age=31536000, immutable"
+UNVERSIONED_CACHE = "public, max-age=3600"
+
+
+def encode_png(card: Card) -> bytes:
+    """Encode the image of a card as a png.
+
+    Args:
+    ----
+    card (Card): The card to encode
+    """
+    with BytesIO() as im_binary:
+        card.image.save(im_binary, "PNG")
+        return im_binary.getvalue()
+
+
+class CardImages:
+
+    """Card images encoded once and served with strong etags.
+
+    Images are encoded the first time they are asked for and kept until the card
+    is replaced in the universe. Links made by `url` contain the hash of the image,
+    so they can be cached forever and change whenever a reload changes the card.
+    """
+
+    def __init__(
+        self: "CardImages",
+        universe: dict[str, Card],
+        bot_server: Application,
+        base_url: Optional[str] = None,
+    ) -> None:
+        """Add the card image routes to the web server.
+
+        Args:
+        ----
+        universe (dict): Dictionary that converts card ids to Card objects
+        bot_server (Application): The web server to serve images from
+        base_url (str): Optional, the public address of the web server, links to
+        images can't be made without it
+        """
+        self.universe: dict[str, Card] = universe
+        self.base_url: Optional[str] = base_url.rstrip("/") if base_url else None
+        self.bodies: dict[str, tuple[Card, CachedBody]] = {}
+        self.encoding: dict[str, Future] = {}
+        self.numeric_ids: dict[int, str] = {}
+
+        bot_server.add_routes([get_route("/cards/{card_id}.png", self.get_card)])
+
+    def find(self: "CardImages", card_id: str) -> Optional[Card]:
+        """Get a card from its text or numeric id.
+
+        Args:
+        ----
+        card_id (str): The text id or numeric id of the card
+        """
+        card = self.universe.get(card_id)
+        if card is not None or not card_id.isdigit():
+            return card
+        numeric_id = int(card_id)
+        card = self.universe.get(self.numeric_ids.get(numeric_id, ""))
+        if card is None or card.numeric_id != numeric_id:
+            self.numeric_ids = {
+                card.numeric_id: card.text_id for card in self.universe.values()
+            }
+            card = self.universe.get(self.numeric_ids.get(numeric_id, ""))
+        return card
+
+    async def body(self: "CardImages", card: Card) -> CachedBody:
+        """Get the encoded image of a card, encoding it if it changed.
+
+        Args:
+        ----
+        card (Card): The card to get the image of
+        """
+        cached = self.bodies.get(card.text_id)
+        if cached is not None and cached[0] is card:
+            return cached[1]
+        pending = self.encoding.get(card.text_id)
+        if pending is None:
+            pending = get_running_loop().run_in_executor(None, encode_png, card)
+            self.encoding[card.text_id] = pending
+            try:
+                png = await pending
+            finally:
+                del self.encoding[card.text_id]
+            body = CachedBody(png, "image/png", UNVERSIONED_CACHE)
+            self.bodies[card.text_id] = (card, body)
+            return body
+        await pending
+        return self.bodies[card.text_id][1]
+
+    async def url(self: "CardImages", card: Card) -> Optional[str]:
+        """Get a link to the image of a card, or None without a public address.
+
+        Args:
+        ----
+        card (Card): The card to link to
+        """
+        if self.base_url is None:
+            return None
+        body = await self.body(card)
+        return f"{self.base_url}/cards/{card.text_id}.png?v={body.etag[:12]}"
+
+    async def get_card(self: "CardImages", req: Request) -> Response:
+        """Get the image of a card by its text or numeric id."""
+        card = self.find(req.match_info["card_id"])
+        if card is None:
+            return Response(status=404)
+        body = await self.body(card)
+        response = body.respond(req)
+        if req.query.get("v") == body.etag[:12]:
+            response.headers["Cache-Control"] = VERSIONED_CACHE
+        return response
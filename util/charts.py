@@ -0,0 +1,70 @@
+"""Render charts for commands without blocking the event loop."""
+from asyncio import get_running_loop
+from functools import lru_cache
+from io import BytesIO
+
+from .probability import probability
+
+DRAWS = 35
+
+
+@lru_cache(maxsize=256)
+def hermit_chances(hermits: int, desired_hermits: int) -> tuple[float, ...]:
+    """Get the percentage chance of having enough hermits after each draw.
+
+    Args:
+    ----
+    hermits (int): The number of hermits in the deck
+    desired_hermits (int): The target hermit count
+    """
+    return tuple(probability(hermits, i, desired_hermits) * 100 for i in range(DRAWS))
+
+
+@lru_cache(maxsize=256)
+def render_hermit_chart(
+    hermits: int, desired_hermits: int, desired_chance: int
+) -> bytes:
+    """Render the chance of drawing hermits as png bytes.
+
+    Uses the object-oriented Agg API rather than pyplot so it is safe to call from
+    worker threads, matplotlib is only imported the first time a graph is needed.
+
+    Args:
+    ----
+    hermits (int): The number of hermits in the deck
+    desired_hermits (int): The target hermit count
+    desired_chance (int): The chance to mark on the graph
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(range(DRAWS), hermit_chances(hermits, desired_hermits))
+    ax.axhline(desired_chance, color="grey", linestyle="--", linewidth=1)
+    ax.set_xlabel("Draws")
+    ax.set_ylabel("Probability")
+    ax.set_title(
+        f"Chance of having {desired_hermits} hermits in your hand after x draws for {hermits} hermits"  # noqa: E501
+    )
+    ax.grid(visible=True)
+    with BytesIO() as figure_bytes:
+        fig.savefig(figure_bytes, format="png")
+        return figure_bytes.getvalue()
+
+
+async def hermit_chart(
+    hermits: int, desired_hermits: int, desired_chance: int
+) -> bytes:
+    """Render the hermit chance chart in a worker thread.
+
+    Args:
+    ----
+    hermits (int): The number of hermits in the deck
+    desired_hermits (int): The target hermit count
+    desired_chance (int): The chance to mark on the graph
+    """
+    return await get_running_loop().run_in_executor(
+        None, render_hermit_chart, hermits, desired_hermits, desired_chance
+    )
@@ -1,9 +1,34 @@
 """Everything to do with deck handling, originally by ProfNinja."""
 import base64
-from binascii import Error as binError
+from collections import Counter
+from dataclasses import dataclass, field
+from math import ceil, sqrt
+from typing import Iterable, Iterator, Optional
+
+from PIL import Image
 
 from .datagen import Card
 
+HERMIT_TYPES = (
+    "miner",
+    "terraform",
+    "speedrunner",
+    "pvp",
+    "builder",
+    "balanced",
+    "explorer",
+    "prankster",
+    "redstone",
+    "farm",
+)
+HERMIT, EFFECT, ITEM = range(3)
+
+
+def best_factors(number: int) -> tuple[int, int]:
+    """Get as close to being square as possible."""
+    x = sqrt(number) // 1
+    return ceil(x), ceil(x if number - x**2 == 0 else (number - x**2) / x + x)
+
 
 def deck_to_hash(deck: list[str], universe: dict[str, Card]) -> str:
     """Convert a list of cards to a deck hash string.
@@ -18,6 +43,22 @@ def deck_to_hash(deck: list[str], universe: dict[str, Card]) -> str:
     return deck_hash.decode()
 
 
+def decode_hash(deck_hash: str) -> Optional[list[int]]:
+    """Get the numeric ids in a deck hash, or None if it isn't a valid hash.
+
+    Args:
+    ----
+    deck_hash (str): The deck's encoded hash
+    """
+    try:
+        raw = base64.b64decode("".join(deck_hash.split()), validate=True)
+        if raw.isascii():
+            return list(raw)
+        return [ord(char) for char in raw.decode("utf8")]
+    except ValueError:  # Covers invalid base64 and utf8
+        return None
+
+
 def hash_to_deck(deck_hash: str, universe: dict[str, Card]) -> list[Card]:
     """Convert a deck hash to list of ids.
 
@@ -26,19 +67,18 @@ def hash_to_deck(deck_hash: str, universe: dict[str, Card]) -> list[Card]:
     deck_hash (str): The deck's encoded hash
     universe (dict): Dictionary that converts card ids to Card objects
     """
-    try:
-        numeric_ids = [ord(char) for char in base64.b64decode(deck_hash).decode("utf8")]
-        deck = []
-        for numeric_id in numeric_ids:
-            card = next(
-                (card for card in universe.values() if card.numeric_id == numeric_id),
-                None,
-            )
-            if card:
-                deck.append(card)
-        return deck
-    except binError:
+    numeric_ids = decode_hash(deck_hash)
+    if numeric_ids is None:
         return []
+    deck = []
+    for numeric_id in numeric_ids:
+        card = next(
+            (card for card in universe.values() if card.numeric_id == numeric_id),
+            None,
+        )
+        if card:
+            deck.append(card)
+    return deck
 
 
 def hash_to_stars(deck_hash: str, universe: dict[str, Card]) -> int:
@@ -54,3 +94,300 @@ def hash_to_stars(deck_hash: str, universe: dict[str, Card]) -> int:
     for card in deck:
         stars += card.cost
     return stars
+
+
+def card_kind(card: Card) -> int:
+    """Get if a card is a hermit (0), effect (1) or item (2).
+
+    Args:
+    ----
+    card (Card): The card to check
+    """
+    if card.text_id.startswith("item"):
+        return ITEM
+    if card.text_id.endswith(("rare", "common")):
+        return HERMIT
+    return EFFECT
+
+
+def sort_deck(deck: list[Card]) -> tuple[list[Card], list[Card], list[Card]]:
+    """Split a deck into its hermits, effects and items, each sorted by id.
+
+    Args:
+    ----
+    deck (list): The cards in the deck
+    """
+    kinds: tuple[list[Card], ...] = ([], [], [])
+    for card in deck:
+        kinds[card_kind(card)].append(card)
+    hermits, effects, items = kinds
+
+    hermits.sort(key=lambda x: x.numeric_id)
+    items.sort(key=lambda x: x.numeric_id)
+    effects.sort(key=lambda x: x.numeric_id)
+    return hermits, effects, items
+
+
+def hermit_types(hermits: list[Card]) -> dict[str, int]:
+    """Count the hermits of each type.
+
+    Args:
+    ----
+    hermits (list): The hermits in a deck
+    """
+    type_counts = dict.fromkeys(HERMIT_TYPES, 0)
+    for card in hermits:
+        if card.hermit_type in type_counts:
+            type_counts[card.hermit_type] += 1
+    return type_counts
+
+
+def deck_image(deck: list[Card]) -> Image.Image:
+    """Arrange the cards of a deck in a grid, hermits first.
+
+    Args:
+    ----
+    deck (list): The cards in the deck
+    """
+    hermits, effects, items = sort_deck(deck)
+    width, height = best_factors(len(deck))
+    im = Image.new("RGBA", (width * 200, height * 200))
+    for i, card in enumerate(hermits + effects + items):
+        new_card = card.image.resize((200, 200)).convert("RGBA")
+        im.paste(new_card, ((i % width) * 200, (i // width) * 200), new_card)
+    return im
+
+
+@dataclass
+class DeckRules:
+
+    """The limits a legal deck has to fit in."""
+
+    min_cards: int = 42
+    max_cards: int = 42
+    max_tokens: int = 42
+    max_copies: int = 3
+
+
+@dataclass
+class DeckProblem:
+
+    """A reason a deck isn't legal.
+
+    `reason` is one of "malformed", "size", "tokens", "copies", "unknown" or
+    "excluded", `cards` lists the ids of the cards responsible.
+    """
+
+    reason: str
+    message: str
+    cards: list[str] = field(default_factory=list)
+
+
+class DeckValidator:
+
+    """Check decks against the deck rules.
+
+    The cost and copy limit of each card are kept in lists indexed by numeric id,
+    so each card in a hash costs a few list lookups instead of a search of the
+    universe. The lists are rebuilt when the cards in the universe change.
+    """
+
+    def __init__(
+        self: "DeckValidator",
+        universe: dict[str, Card],
+        rules: Optional[DeckRules] = None,
+        exclude: Iterable[int] = (),
+    ) -> None:
+        """Create a validator.
+
+        Args:
+        ----
+        universe (dict): Dictionary that converts card ids to Card objects
+        rules (DeckRules): Optional, the limits decks have to fit in
+        exclude (Iterable): Optional, numeric ids of cards that can't be used, like
+        `DataGenerator.exclude`
+        """
+        self.universe: dict[str, Card] = universe
+        self.rules: DeckRules = rules or DeckRules()
+        self.exclude: Iterable[int] = exclude
+        self.loaded: tuple[list[Card], set[int]] = ([], set())
+        self.refresh()
+
+    def refresh(self: "DeckValidator") -> bool:
+        """Rebuild the card lists if the universe changed, returning if it did."""
+        loaded = (list(self.universe.values()), set(self.exclude))
+        if loaded == self.loaded:
+            return False
+        self.loaded = loaded
+        cards, exclude = loaded
+        size = max((card.numeric_id for card in cards), default=-1) + 1
+        self.cards: list[Optional[Card]] = [None] * size
+        self.costs: list[int] = [0] * size
+        self.limits: list[int] = [self.rules.max_copies] * size
+        for card in cards:
+            self.cards[card.numeric_id] = card
+            self.costs[card.numeric_id] = card.cost
+            if card_kind(card) == ITEM:
+                self.limits[card.numeric_id] = self.rules.max_cards
+        self.excluded: frozenset[int] = frozenset(exclude)
+        return True
+
+    def check(self: "DeckValidator", numeric_ids: list[int]) -> list[DeckProblem]:
+        """Check the cards in a deck, returning every rule it breaks.
+
+        Call `refresh` first if the universe might have changed.
+
+        Args:
+        ----
+        numeric_ids (list): The numeric ids of the cards in the deck
+        """
+        rules = self.rules
+        problems = []
+        if not rules.min_cards <= len(numeric_ids) <= rules.max_cards:
+            allowed = (
+                str(rules.max_cards)
+                if rules.min_cards == rules.max_cards
+                else f"{rules.min_cards} to {rules.max_cards}"
+            )
+            problems.append(
+                DeckProblem(
+                    "size", f"{len(numeric_ids)} cards, decks need {allowed} cards"
+                )
+            )
+
+        size = len(self.cards)
+        tokens = 0
+        over, unknown, excluded = [], [], []
+        for numeric_id, copies in Counter(numeric_ids).items():
+            card = self.cards[numeric_id] if numeric_id < size else None
+            if card is None:
+                missing = excluded if numeric_id in self.excluded else unknown
+                missing.append(str(numeric_id))
+                continue
+            tokens += self.costs[numeric_id] * copies
+            if copies > self.limits[numeric_id]:
+                over.append(card.text_id)
+
+        if tokens > rules.max_tokens:
+            problems.append(
+                DeckProblem(
+                    "tokens", f"{tokens} tokens, the limit is {rules.max_tokens}"
+                )
+            )
+        if over:
+            problems.append(
+                DeckProblem(
+                    "copies",
+                    f"{len(over)} cards have more than {rules.max_copies} copies",
+                    over,
+                )
+            )
+        if unknown:
+            problems.append(
+                DeckProblem("unknown", f"{len(unknown)} unknown cards", unknown)
+            )
+        if excluded:
+            problems.append(
+                DeckProblem(
+                    "excluded", f"{len(excluded)} cards can't be used", excluded
+                )
+            )
+        return problems
+
+    def validate(self: "DeckValidator", deck_hash: str) -> list[DeckProblem]:
+        """Check a deck hash, returning every rule it breaks.
+
+        Args:
+        ----
+        deck_hash (str): The deck's encoded hash
+        """
+        self.refresh()
+        numeric_ids = decode_hash(deck_hash)
+        if numeric_ids is None:
+            return [DeckProblem("malformed", "Invalid deck hash")]
+        return self.check(numeric_ids)
+
+    def validate_many(
+        self: "DeckValidator", deck_hashes: Iterable[str]
+    ) -> Iterator[tuple[str, list[DeckProblem]]]:
+        """Check each deck hash in turn.
+
+        Args:
+        ----
+        deck_hashes (Iterable): The encoded hashes of the decks
+        """
+        self.refresh()
+        for deck_hash in deck_hashes:
+            numeric_ids = decode_hash(deck_hash)
+            if numeric_ids is None:
+                yield deck_hash, [DeckProblem("malformed", "Invalid deck hash")]
+            else:
+                yield deck_hash, self.check(numeric_ids)
+
+
+class DeckAnalyzer(DeckValidator):
+
+    """Check and summarise many deck hashes at once."""
+
+    def refresh(self: "DeckAnalyzer") -> bool:
+        """Rebuild the card lists if the universe changed, returning if it did."""
+        if not super().refresh():
+            return False
+        size = len(self.cards)
+        self.kinds: list[int] = [EFFECT] * size
+        self.types: list[int] = [len(HERMIT_TYPES)] * size
+        for card in self.loaded[0]:
+            self.kinds[card.numeric_id] = card_kind(card)
+            hermit_type = getattr(card, "hermit_type", None)
+            if self.kinds[card.numeric_id] == HERMIT and hermit_type in HERMIT_TYPES:
+                self.types[card.numeric_id] = HERMIT_TYPES.index(hermit_type)
+        self.order: list[int] = [
+            kind * size + numeric_id for numeric_id, kind in enumerate(self.kinds)
+        ]
+        return True
+
+    def analyze(self: "DeckAnalyzer", deck_hash: str) -> dict:
+        """Get the legality, token cost, hei ratio, hermit types and cards of a deck.
+
+        Call `refresh` first if the universe might have changed.
+
+        Args:
+        ----
+        deck_hash (str): The deck's encoded hash
+        """
+        numeric_ids = decode_hash(deck_hash)
+        if numeric_ids is None:
+            problem = DeckProblem("malformed", "Invalid deck hash")
+            return {"hash": deck_hash, "legal": False, "problems": [vars(problem)]}
+        problems = self.check(numeric_ids)
+        size = len(self.cards)
+        known = [i for i in numeric_ids if i < size and self.cards[i] is not None]
+
+        known.sort(key=self.order.__getitem__)
+        hei = [0, 0, 0]
+        type_counts = [0] * (len(HERMIT_TYPES) + 1)  # The last counts non hermits
+        for numeric_id in known:
+            hei[self.kinds[numeric_id]] += 1
+            type_counts[self.types[numeric_id]] += 1
+        return {
+            "hash": deck_hash,
+            "legal": not problems,
+            "problems": [vars(problem) for problem in problems],
+            "cards": [self.cards[numeric_id].text_id for numeric_id in known],
+            "tokens": sum(map(self.costs.__getitem__, known)),
+            "hei": hei,
+            "types": dict(zip(HERMIT_TYPES, type_counts[:-1], strict=True)),
+        }
+
+    def analyze_many(
+        self: "DeckAnalyzer", deck_hashes: Iterable[str]
+    ) -> Iterator[dict]:
+        """Analyze each deck in turn.
+
+        Args:
+        ----
+        deck_hashes (Iterable): The encoded hashes of the decks
+        """
+        self.refresh()
+        for deck_hash in deck_hashes:
+            yield self.analyze(deck_hash)
@@ -0,0 +1,253 @@
+"""Serve deck images and statistics from the bot's web server."""
+from asyncio import Semaphore, Task, create_task, get_running_loop, shield
+from io import BytesIO
+from itertools import islice
+from json import dumps
+from typing import Hashable, Iterable, Optional
+
+from aiohttp.web import (
+    Application,
+    Request,
+    Response,
+    StreamResponse,
+    json_response,
+    post,
+)
+from aiohttp.web import get as get_route
+
+from .cache import TTLCache
+from .datagen import Card
+from .deck import (
+    DeckAnalyzer,
+    DeckRules,
+    deck_image,
+    decode_hash,
+    hermit_types,
+    sort_deck,
+)
+from .responses import CachedBody
+from .webhooks import parse_json, read_body
+
+DECK_CACHE = "public, max-age=86400"
+
+
+def encode_deck(deck: list[Card]) -> bytes:
+    """Render the image of a deck as a png.
+
+    Args:
+    ----
+    deck (list): The cards in the deck
+    """
+    with BytesIO() as im_binary:
+        deck_image(deck).save(im_binary, "PNG")
+        return im_binary.getvalue()
+
+
+def deck_summary(deck_hash: str, deck: list[Card]) -> dict:
+    """Get the statistics `/card deck` shows for a deck.
+
+    Args:
+    ----
+    deck_hash (str): The deck's encoded hash
+    deck (list): The cards in the deck
+    """
+    hermits, effects, items = sort_deck(deck)
+    return {
+        "hash": deck_hash,
+        "cards": [card.text_id for card in hermits + effects + items],
+        "tokens": sum(card.cost for card in deck),
+        "hei": [len(hermits), len(effects), len(items)],
+        "types": hermit_types(hermits),
+    }
+
+
+class DeckPreviews:
+
+    """Deck images and statistics, rendered on demand and kept for reuse.
+
+    Images are cached by the sorted card ids in the hash, so hashes listing the
+    same cards in a different order share one image, and summaries by the hash.
+    A cached deck is served without looking its cards up again unless one of them
+    was reloaded. At most `renders` images are drawn at once and once `queue_size`
+    are waiting new decks are turned away until they finish.
+    """
+
+    def __init__(
+        self: "DeckPreviews",
+        universe: dict[str, Card],
+        bot_server: Application,
+        cache_size: int = 256,
+        cache_ttl: float = 60 * 60,
+        renders: int = 2,
+        queue_size: int = 32,
+        max_batch: int = 5000,
+        rules: Optional[DeckRules] = None,
+        exclude: Iterable[int] = (),
+    ) -> None:
+        """Add the deck routes to the web server.
+
+        Args:
+        ----
+        universe (dict): Dictionary that converts card ids to Card objects
+        bot_server (Application): The web server to serve decks from
+        cache_size (int): Optional, the number of deck images and summaries kept
+        cache_ttl (float): Optional, seconds to keep a deck image or summary for
+        renders (int): Optional, the number of images drawn at once
+        queue_size (int): Optional, the number of images that can wait to be drawn
+        max_batch (int): Optional, the most decks that can be analyzed in a request
+        rules (DeckRules): Optional, the limits analyzed decks have to fit in
+        exclude (Iterable): Optional, numeric ids of cards that can't be used
+        """
+        self.universe: dict[str, Card] = universe
+        self.images = TTLCache(cache_ttl, max_size=cache_size)
+        self.summaries = TTLCache(cache_ttl, max_size=cache_size)
+        self.rendering: dict[tuple[int, ...], Task] = {}
+        self.renders = Semaphore(renders)
+        self.queue_size: int = queue_size
+        self.analyzer = DeckAnalyzer(universe, rules, exclude)
+        self.max_batch: int = max_batch
+
+        bot_server.add_routes(
+            [
+                get_route("/deck/{deck_hash:.+}.png", self.get_image),
+                get_route("/deck/{deck_hash:.+}.json", self.get_summary),
+                post("/decks/analyze", self.analyze),
+            ]
+        )
+
+    def find(self: "DeckPreviews", req: Request) -> Optional[list[int]]:
+        """Get the numeric ids in the hash a request is for, or None if it is invalid.
+
+        Args:
+        ----
+        req (Request): The web request sent
+        """
+        deck_hash = req.match_info["deck_hash"].replace("-", "+").replace("_", "/")
+        return decode_hash(deck_hash) or None
+
+    def build(self: "DeckPreviews", numeric_ids: list[int]) -> Optional[list[Card]]:
+        """Get the cards with some numeric ids, or None if they aren't a valid deck.
+
+        Args:
+        ----
+        numeric_ids (list): The numeric ids of the cards in the deck
+        """
+        self.analyzer.refresh()
+        cards = self.analyzer.cards
+        deck = [
+            cards[numeric_id]
+            for numeric_id in numeric_ids
+            if numeric_id < len(cards) and cards[numeric_id] is not None
+        ]
+        if not deck or len(deck) > 100:
+            return None
+        return deck
+
+    def cached(
+        self: "DeckPreviews", cache: TTLCache, key: Hashable, numeric_ids: list[int]
+    ) -> Optional[CachedBody]:
+        """Get a cached body, or None if it is missing or its cards were reloaded.
+
+        Args:
+        ----
+        cache (TTLCache): The cache to look in
+        key (Hashable): The key the body is cached by
+        numeric_ids (list): The numeric ids of the cards in the deck
+        """
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        cards, body = entry
+        if len(cards) == len(numeric_ids) and all(
+            self.universe.get(card.text_id) is card for card in cards
+        ):
+            return body
+        deck = self.build(numeric_ids)  # Some cards are unknown or were reloaded
+        if deck is not None and sorted(map(id, deck)) == sorted(map(id, cards)):
+            return body
+        return None
+
+    async def render(
+        self: "DeckPreviews", key: tuple[int, ...], deck: list[Card]
+    ) -> CachedBody:
+        """Draw the image of a deck and cache it.
+
+        Args:
+        ----
+        key (tuple): The sorted numeric ids in the deck's hash
+        deck (list): The cards in the deck
+        """
+        async with self.renders:
+            png = await get_running_loop().run_in_executor(None, encode_deck, deck)
+        body = CachedBody(png, "image/png", DECK_CACHE)
+        self.images.set(key, (deck, body))
+        return body
+
+    async def get_image(self: "DeckPreviews", req: Request) -> Response:
+        """Get the image of a deck."""
+        numeric_ids = self.find(req)
+        if numeric_ids is None:
+            return Response(status=404)
+        key = tuple(sorted(numeric_ids))
+        cached = self.cached(self.images, key, numeric_ids)
+        if cached is not None:
+            return cached.respond(req)
+        pending = self.rendering.get(key)
+        if pending is None:
+            deck = self.build(numeric_ids)
+            if deck is None:
+                return Response(status=404)
+            if len(self.rendering) >= self.queue_size:
+                return Response(status=503, headers={"Retry-After": "1"})
+            pending = create_task(self.render(key, deck))
+            self.rendering[key] = pending
+            pending.add_done_callback(lambda _: self.rendering.pop(key, None))
+        body = await shield(pending)
+        return body.respond(req)
+
+    async def get_summary(self: "DeckPreviews", req: Request) -> Response:
+        """Get the token cost, hei ratio, hermit types and cards of a deck."""
+        numeric_ids = self.find(req)
+        if numeric_ids is None:
+            return Response(status=404)
+        key = req.match_info["deck_hash"]
+        body = self.cached(self.summaries, key, numeric_ids)
+        if body is None:
+            deck = self.build(numeric_ids)
+            if deck is None:
+                return Response(status=404)
+            summary = deck_summary(key, deck)
+            body = CachedBody(dumps(summary).encode(), "application/json", DECK_CACHE)
+            self.summaries.set(key, (deck, body))
+        return body.respond(req)
+
+    async def analyze(self: "DeckPreviews", req: Request) -> Response:
+        """Analyze a list of deck hashes, or {"hashes": [...]}.
+
+        Results are streamed as one json object per line when the request accepts
+        application/x-ndjson.
+        """
+        body = await read_body(req, self.max_batch * 1024)
+        if body is None:
+            return Response(status=413, reason="Payload too large")
+        payload = parse_json(body)
+        if isinstance(payload, dict):
+            payload = payload.get("hashes")
+        if not isinstance(payload, list) or not all(
+            isinstance(deck_hash, str) for deck_hash in payload
+        ):
+            return Response(status=400, reason="Expected a list of deck hashes")
+        if len(payload) > self.max_batch:
+            return Response(status=413, reason=f"At most {self.max_batch} decks")
+
+        results = self.analyzer.analyze_many(payload)
+        if "application/x-ndjson" not in req.headers.get("Accept", ""):
+            return json_response({"decks": list(results)})
+        response = StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(req)
+        while chunk := list(islice(results, 250)):
+            await response.write(
+                "".join(f"{dumps(result)}\n" for result in chunk).encode()
+            )
+        await response.write_eof()
+        return response
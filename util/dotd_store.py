@@ -0,0 +1,290 @@
+"""Persist dotd results and season totals for each guild."""
+import sqlite3
+from dataclasses import dataclass
+from time import time
+from typing import Optional
+
+
+@dataclass
+class DotdResult:
+
+    """A player's result in one dotd event."""
+
+    user_id: str
+    wins: int
+    ties: int
+    losses: int
+
+
+@dataclass
+class DotdTotal:
+
+    """A player's combined results over a season."""
+
+    user_id: str
+    events: int
+    wins: int
+    ties: int
+    losses: int
+    streak: int
+    best_streak: int
+
+
+@dataclass
+class DotdEvent:
+
+    """A finished dotd event."""
+
+    id: int
+    season: int
+    started: float
+    closed: float
+    players: int
+    winner: Optional[str]
+
+
+class DotdStore:
+
+    """Sqlite store of dotd events, with running totals for each season.
+
+    Totals are updated once when an event is closed, so standings are read straight
+    from the totals table instead of adding up every past event. A streak is the
+    number of events in a row a player finished with more wins than losses.
+    """
+
+    def __init__(self: "DotdStore", path: str = "dotd.db") -> None:
+        """Open the store, creating it if needed.
+
+        Args:
+        ----
+        path (str): Optional, the database file
+        """
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seasons (
+                guild TEXT PRIMARY KEY,
+                season INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                started REAL NOT NULL,
+                closed REAL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                event INTEGER NOT NULL,
+                user TEXT NOT NULL,
+                wins INTEGER NOT NULL,
+                ties INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                PRIMARY KEY (event, user)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS totals (
+                guild TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                user TEXT NOT NULL,
+                events INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                ties INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                streak INTEGER NOT NULL,
+                best_streak INTEGER NOT NULL,
+                PRIMARY KEY (guild, season, user)
+            ) WITHOUT ROWID;
+            CREATE UNIQUE INDEX IF NOT EXISTS events_open
+                ON events (guild) WHERE closed IS NULL;
+            CREATE INDEX IF NOT EXISTS events_guild ON events (guild, closed);
+            CREATE INDEX IF NOT EXISTS totals_standings
+                ON totals (guild, season, wins DESC, ties DESC);
+            """
+        )
+
+    def season(self: "DotdStore", guild_id: str) -> int:
+        """Get the current season of a guild.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        """
+        row = self.connection.execute(
+            "SELECT season FROM seasons WHERE guild = ?", (guild_id,)
+        ).fetchone()
+        return row[0] if row else 1
+
+    def new_season(self: "DotdStore", guild_id: str) -> int:
+        """Start a new season in a guild, returning its number.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        """
+        season = self.season(guild_id) + 1
+        self.connection.execute(
+            "INSERT OR REPLACE INTO seasons VALUES (?, ?)", (guild_id, season)
+        )
+        return season
+
+    def open_event(self: "DotdStore", guild_id: str) -> int:
+        """Get the id of the running event in a guild, starting one if needed.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        """
+        row = self.connection.execute(
+            "SELECT id FROM events WHERE guild = ? AND closed IS NULL", (guild_id,)
+        ).fetchone()
+        if row:
+            return row[0]
+        return self.connection.execute(
+            "INSERT INTO events (guild, season, started) VALUES (?, ?, ?)",
+            (guild_id, self.season(guild_id), time()),
+        ).lastrowid
+
+    def submit(self: "DotdStore", guild_id: str, result: DotdResult) -> None:
+        """Save a result in the running event, replacing any earlier result.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        result (DotdResult): The player's result
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (
+                self.open_event(guild_id),
+                result.user_id,
+                result.wins,
+                result.ties,
+                result.losses,
+            ),
+        )
+
+    def results(
+        self: "DotdStore", guild_id: str, event_id: Optional[int] = None
+    ) -> list[DotdResult]:
+        """Get the results of an event, best first.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        event_id (int): Optional, the event to get, defaults to the running event
+        """
+        if event_id is None:
+            query = "SELECT id FROM events WHERE guild = ? AND closed IS NULL"
+            args: tuple = (guild_id,)
+        else:
+            query = "SELECT id FROM events WHERE guild = ? AND id = ?"
+            args = (guild_id, event_id)
+        row = self.connection.execute(query, args).fetchone()
+        if row is None:
+            return []
+        return [
+            DotdResult(*result)
+            for result in self.connection.execute(
+                "SELECT user, wins, ties, losses FROM results WHERE event = ? "
+                "ORDER BY wins DESC, ties DESC",
+                (row[0],),
+            )
+        ]
+
+    def close_event(self: "DotdStore", guild_id: str) -> list[DotdResult]:
+        """Finish the running event and add its results to the season totals.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        """
+        results = self.results(guild_id)
+        if not results:
+            return results
+        event_id = self.open_event(guild_id)
+        season = self.season(guild_id)
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.execute(
+                "UPDATE events SET closed = ? WHERE id = ?", (time(), event_id)
+            )
+            self.connection.executemany(
+                """
+                INSERT INTO totals VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT (guild, season, user) DO UPDATE SET
+                    events = events + 1,
+                    wins = wins + excluded.wins,
+                    ties = ties + excluded.ties,
+                    losses = losses + excluded.losses,
+                    streak = CASE WHEN excluded.streak THEN streak + 1 ELSE 0 END,
+                    best_streak = MAX(
+                        best_streak,
+                        CASE WHEN excluded.streak THEN streak + 1 ELSE 0 END
+                    )
+                """,
+                [
+                    (
+                        guild_id,
+                        season,
+                        result.user_id,
+                        result.wins,
+                        result.ties,
+                        result.losses,
+                        int(result.wins > result.losses),
+                        int(result.wins > result.losses),
+                    )
+                    for result in results
+                ],
+            )
+        return results
+
+    def events(
+        self: "DotdStore", guild_id: str, limit: int = 10
+    ) -> list[DotdEvent]:
+        """Get the most recent finished events in a guild.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        limit (int): Optional, the number of events to get
+        """
+        return [
+            DotdEvent(*row)
+            for row in self.connection.execute(
+                """
+                SELECT id, season, started, closed,
+                    (SELECT COUNT(*) FROM results WHERE event = events.id),
+                    (SELECT user FROM results WHERE event = events.id
+                        ORDER BY wins DESC, ties DESC LIMIT 1)
+                FROM events WHERE guild = ? AND closed IS NOT NULL
+                ORDER BY closed DESC LIMIT ?
+                """,
+                (guild_id, limit),
+            )
+        ]
+
+    def standings(
+        self: "DotdStore", guild_id: str, season: int, limit: int = 25
+    ) -> list[DotdTotal]:
+        """Get the players with the most wins in a season.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild
+        season (int): The season to get
+        limit (int): Optional, the number of players to get
+        """
+        return [
+            DotdTotal(*row)
+            for row in self.connection.execute(
+                "SELECT user, events, wins, ties, losses, streak, best_streak "
+                "FROM totals WHERE guild = ? AND season = ? "
+                "ORDER BY wins DESC, ties DESC LIMIT ?",
+                (guild_id, season, limit),
+            )
+        ]
+
+    def close(self: "DotdStore") -> None:
+        """Close the database."""
+        self.connection.close()
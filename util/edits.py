@@ -0,0 +1,74 @@
+"""Coalescing of repeated message edits."""
+from asyncio import Lock, Task, create_task, sleep
+from typing import Awaitable, Callable, Optional
+
+
+class EditCoalescer:
+
+    """Merge edits to one message so at most one is in flight at a time.
+
+    Edits requested with `request` are made in the background and failures are
+    only printed, a later request tries again. `flush` raises failures so the
+    caller can retry the final edit.
+    """
+
+    def __init__(
+        self: "EditCoalescer", edit: Callable[[], Awaitable[None]], delay: float = 1
+    ) -> None:
+        """Coalesce edits made with `edit`.
+
+        Args:
+        ----
+        edit (Callable): Coroutine function that edits the message to its
+        latest state
+        delay (float): Optional, seconds to wait for more changes before editing
+        """
+        self.edit: Callable[[], Awaitable[None]] = edit
+        self.delay: float = delay
+
+        self.dirty: bool = False
+        self.edits: int = 0
+        self.lock: Lock = Lock()
+        self.task: Optional[Task] = None
+
+    def request(self: "EditCoalescer") -> None:
+        """Ask for the message to be edited soon, merging with other requests."""
+        self.dirty = True
+        if self.task is None or self.task.done():
+            self.task = create_task(self.run())
+
+    async def run(self: "EditCoalescer") -> None:
+        """Wait for changes to settle, then edit until nothing is pending."""
+        await sleep(self.delay)
+        while self.dirty:
+            try:
+                await self.apply()
+            except Exception as e:  # noqa: BLE001
+                print(f"Failed to edit message: {e!r}")
+                return
+
+    async def apply(self: "EditCoalescer") -> None:
+        """Edit the message if there are pending changes, raising if the edit fails.
+
+        The changes stay pending after a failure, so the next edit includes them.
+        """
+        async with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            self.edits += 1
+            try:
+                await self.edit()
+            except BaseException:
+                self.dirty = True
+                raise
+
+    async def flush(self: "EditCoalescer") -> None:
+        """Edit the message now and wait for the edit to finish.
+
+        Errors from the edit are raised, unlike edits made in the background.
+        """
+        self.dirty = True
+        if self.task is not None and not self.task.done() and not self.lock.locked():
+            self.task.cancel()  # Still waiting out the delay
+        await self.apply()
@@ -0,0 +1,169 @@
+"""Background processing of webhook events."""
+from asyncio import (
+    CancelledError,
+    Queue,
+    QueueFull,
+    Task,
+    create_task,
+    gather,
+    sleep,
+    wait_for,
+)
+from asyncio import TimeoutError as AsyncTimeoutError
+from time import monotonic
+from typing import Any, Awaitable, Callable, Optional
+from zlib import crc32
+
+from aiohttp import ClientError
+from interactions.client.errors import HTTPException
+
+
+def is_transient(error: Exception) -> bool:
+    """Check if an error is worth retrying.
+
+    Args:
+    ----
+    error (Exception): The error raised while processing an event
+    """
+    if isinstance(error, HTTPException):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (ClientError, AsyncTimeoutError))
+
+
+class EventQueue:
+
+    """Process events in the background, keeping events for one key in order."""
+
+    def __init__(
+        self: "EventQueue",
+        workers: int = 4,
+        max_size: int = 1000,
+        max_retries: int = 3,
+        retry_delay: float = 1,
+    ) -> None:
+        """Create the queue, workers are started when the first event is submitted.
+
+        Args:
+        ----
+        workers (int): The number of events processed at once
+        max_size (int): The number of waiting events each worker accepts
+        max_retries (int): How many times to retry an event that failed
+        retry_delay (float): Seconds to wait before the first retry, doubling after
+        """
+        self.max_retries: int = max_retries
+        self.retry_delay: float = retry_delay
+
+        self.queues: list[Queue] = [Queue(max_size) for _ in range(workers)]
+        self.tasks: list[Task] = []
+
+        self.processed: int = 0
+        self.failed: int = 0
+        self.retried: int = 0
+        self.rejected: int = 0
+        self.last_lag: float = 0
+        self.max_lag: float = 0
+
+    def submit(
+        self: "EventQueue",
+        key: str,
+        callback: Callable[..., Awaitable[Any]],
+        *args: Any,  # noqa: ANN401
+    ) -> bool:
+        """Add an event to the queue, returning False if the queue is full.
+
+        Args:
+        ----
+        key (str): Events with the same key are processed in submission order
+        callback (Callable): The coroutine function that processes the event
+        *args (Any): Arguments to call the callback with
+        """
+        if not self.tasks:
+            self.tasks = [create_task(self.worker(queue)) for queue in self.queues]
+        queue = self.queues[crc32(str(key).encode()) % len(self.queues)]
+        try:
+            queue.put_nowait((monotonic(), callback, args))
+        except QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def worker(self: "EventQueue", queue: Queue) -> None:
+        """Process events from one queue until cancelled.
+
+        Args:
+        ----
+        queue (Queue): The queue to take events from
+        """
+        while True:
+            submitted, callback, args = await queue.get()
+            self.last_lag = monotonic() - submitted
+            self.max_lag = max(self.max_lag, self.last_lag)
+            try:
+                await self.process(callback, args)
+            finally:
+                queue.task_done()
+
+    async def process(
+        self: "EventQueue", callback: Callable[..., Awaitable[Any]], args: tuple
+    ) -> None:
+        """Run an event callback, retrying transient failures.
+
+        Args:
+        ----
+        callback (Callable): The coroutine function that processes the event
+        args (tuple): Arguments to call the callback with
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await callback(*args)
+            except CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                if attempt < self.max_retries and is_transient(e):
+                    self.retried += 1
+                    await sleep(self.retry_delay * 2**attempt)
+                    continue
+                self.failed += 1
+                print(f"Failed to process event {callback.__qualname__}: {e!r}")
+                return
+            self.processed += 1
+            return
+
+    @property
+    def depth(self: "EventQueue") -> int:
+        """The number of events waiting to be processed."""
+        return sum(queue.qsize() for queue in self.queues)
+
+    def metrics(self: "EventQueue") -> dict[str, float]:
+        """Get statistics about the queue."""
+        return {
+            "depth": self.depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "last_lag": round(self.last_lag, 3),
+            "max_lag": round(self.max_lag, 3),
+        }
+
+    async def join(self: "EventQueue") -> None:
+        """Wait until every submitted event has been processed."""
+        await gather(*(queue.join() for queue in self.queues))
+
+    async def stop(self: "EventQueue", timeout: Optional[float] = 10) -> None:
+        """Finish waiting events, then stop the workers.
+
+        Args:
+        ----
+        timeout (float): Optional, seconds to wait for waiting events to finish
+        """
+        if not self.tasks:
+            return
+        try:
+            await wait_for(self.join(), timeout)
+        except AsyncTimeoutError:
+            print(f"Dropping {self.depth} unprocessed events")
+        for task in self.tasks:
+            task.cancel()
+        await gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
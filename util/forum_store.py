@@ -0,0 +1,99 @@
+"""Persist the forum posts waiting to be closed."""
+import sqlite3
+from json import load
+from os import path, replace
+from time import time
+from typing import Optional
+
+
+class ForumStore:
+
+    """Sqlite store of forum posts to close at the next update.
+
+    Every change is a single row write, so recording a closed post costs the same
+    however many posts are waiting.
+    """
+
+    def __init__(self: "ForumStore", db_path: str = "forums.db") -> None:
+        """Open the store, importing `forums.json` if it is still around.
+
+        Args:
+        ----
+        db_path (str): Optional, the database file
+        """
+        self.connection = sqlite3.connect(db_path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS to_close (
+                thread TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                added REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS closing (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                channel TEXT NOT NULL,
+                message TEXT NOT NULL
+            );
+            """
+        )
+        if path.exists("forums.json"):
+            with open("forums.json") as f:
+                for parent, threads in load(f).items():
+                    for thread in threads:
+                        self.add(str(parent), str(thread))
+            replace("forums.json", "forums.json.imported")
+
+    def add(self: "ForumStore", parent: str, thread: str) -> None:
+        """Remember a post to close.
+
+        Args:
+        ----
+        parent (str): The id of the forum
+        thread (str): The id of the post
+        """
+        self.connection.execute(
+            "INSERT OR IGNORE INTO to_close VALUES (?, ?, ?)", (thread, parent, time())
+        )
+
+    def remove(self: "ForumStore", thread: str) -> None:
+        """Forget a post.
+
+        Args:
+        ----
+        thread (str): The id of the post
+        """
+        self.connection.execute("DELETE FROM to_close WHERE thread = ?", (thread,))
+
+    def snapshot(self: "ForumStore") -> list[tuple[str, str]]:
+        """Get the forum and post id of every post waiting to be closed."""
+        return self.connection.execute(
+            "SELECT parent, thread FROM to_close ORDER BY added"
+        ).fetchall()
+
+    def start_closing(self: "ForumStore", channel: str, message: str) -> None:
+        """Remember the status message of a running close.
+
+        Args:
+        ----
+        channel (str): The id of the channel the message is in
+        message (str): The id of the message
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO closing VALUES (0, ?, ?)", (channel, message)
+        )
+
+    def closing(self: "ForumStore") -> Optional[tuple[str, str]]:
+        """Get the channel and message id of an unfinished close, if there is one."""
+        return self.connection.execute(
+            "SELECT channel, message FROM closing"
+        ).fetchone()
+
+    def finish_closing(self: "ForumStore") -> None:
+        """Forget the running close."""
+        self.connection.execute("DELETE FROM closing")
+
+    def compact(self: "ForumStore") -> None:
+        """Move the write ahead log into the database and truncate it."""
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
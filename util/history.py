@@ -0,0 +1,272 @@
+"""Record every finished game so past results can be searched."""
+import sqlite3
+from asyncio import Task, create_task, get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TypeVar
+
+from .cache import TTLCache
+
+T = TypeVar("T")
+
+
+@dataclass
+class GameResult:
+
+    """A game from the point of view of one player."""
+
+    game_id: str
+    name: str
+    opponent: Optional[str]
+    result: int
+    ended: int
+    deck: Optional[str]
+
+
+@dataclass
+class HeadToHead:
+
+    """The record between two players."""
+
+    wins: int = 0
+    ties: int = 0
+    losses: int = 0
+
+    @property
+    def total(self: "HeadToHead") -> int:
+        """The number of games played."""
+        return self.wins + self.ties + self.losses
+
+
+class GameHistory:
+
+    """Sqlite store of finished games.
+
+    Results are buffered in memory and written in batches on a dedicated thread, so
+    recording a game never waits on the disk. Every query is served by an index on
+    player, deck or end time, so they stay fast however many games are stored.
+    """
+
+    def __init__(
+        self: "GameHistory",
+        path: str = "history.db",
+        batch_size: int = 500,
+        deck_ttl: float = 6 * 60 * 60,
+    ) -> None:
+        """Open the history, creating it if needed.
+
+        Args:
+        ----
+        path (str): Optional, the database file
+        batch_size (int): Optional, the number of buffered games that triggers a
+        write before the next scheduled flush
+        deck_ttl (float): Optional, seconds to remember the decks of a started game
+        """
+        self.batch_size: int = batch_size
+        self.executor = ThreadPoolExecutor(1, "history")
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS games (
+                id TEXT PRIMARY KEY,
+                server TEXT NOT NULL,
+                code TEXT,
+                created INTEGER NOT NULL,
+                ended INTEGER NOT NULL,
+                outcome TEXT,
+                reason TEXT
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS players (
+                game_id TEXT NOT NULL,
+                server TEXT NOT NULL,
+                name TEXT NOT NULL COLLATE NOCASE,
+                opponent TEXT COLLATE NOCASE,
+                result INTEGER NOT NULL,
+                ended INTEGER NOT NULL,
+                deck TEXT,
+                PRIMARY KEY (game_id, name)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS games_ended ON games (server, ended);
+            CREATE INDEX IF NOT EXISTS players_name
+                ON players (server, name, ended);
+            CREATE INDEX IF NOT EXISTS players_opponent
+                ON players (server, name, opponent, result);
+            CREATE INDEX IF NOT EXISTS players_deck
+                ON players (server, deck, ended);
+            """
+        )
+
+        self.decks = TTLCache(deck_ttl, max_size=10000)
+        self.games: list[tuple] = []
+        self.players: list[tuple] = []
+        self.flushing: Optional[Task] = None
+        self.recorded: int = 0
+
+    def record_start(
+        self: "GameHistory", game_id: str, decks: dict[str, Optional[str]]
+    ) -> None:
+        """Remember the decks used in a game until it ends.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        decks (dict): The deck hash of each player, by player id
+        """
+        self.decks.set(game_id, decks)
+
+    def record_end(self: "GameHistory", server_id: str, game: dict[str, Any]) -> None:
+        """Buffer a finished game to be written.
+
+        Args:
+        ----
+        server_id (str): The server the game was on
+        game (dict): The game_end data
+        """
+        end_info: dict = game["endInfo"]
+        winner: Optional[str] = end_info.get("winner")
+        decks: dict[str, Optional[str]] = self.decks.pop(game["id"]) or {}
+        names: list[str] = game["playerNames"]
+        self.games.append(
+            (
+                game["id"],
+                server_id,
+                game["code"],
+                game["createdTime"],
+                game["endTime"],
+                end_info.get("outcome"),
+                end_info.get("reason"),
+            )
+        )
+        for player_id, name in zip(game["playerIds"], names, strict=True):
+            if winner is None:
+                result = 0
+            else:
+                result = 1 if player_id == winner else -1
+            opponents = [other for other in names if other != name]
+            self.players.append(
+                (
+                    game["id"],
+                    server_id,
+                    name,
+                    opponents[0] if len(opponents) == 1 else None,
+                    result,
+                    game["endTime"],
+                    decks.get(player_id),
+                )
+            )
+        if len(self.games) >= self.batch_size:
+            self.request_flush()
+
+    def request_flush(self: "GameHistory") -> None:
+        """Start writing buffered games, unless a write is already running."""
+        if self.flushing is None or self.flushing.done():
+            self.flushing = create_task(self.flush())
+
+    async def flush(self: "GameHistory") -> None:
+        """Write every buffered game."""
+        if not self.games:
+            return
+        games, self.games = self.games, []
+        players, self.players = self.players, []
+        await self.run(self.write, games, players)
+        self.recorded += len(games)
+
+    def write(self: "GameHistory", games: list[tuple], players: list[tuple]) -> None:
+        """Write games in one transaction, games already stored are skipped.
+
+        Args:
+        ----
+        games (list): Rows for the games table
+        players (list): Rows for the players table
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO games VALUES (?,?,?,?,?,?,?)", games
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO players VALUES (?,?,?,?,?,?,?)", players
+            )
+
+    async def run(self: "GameHistory", function: Callable[..., T], *args: Any) -> T:  # noqa: ANN401
+        """Run a function on the database thread.
+
+        Args:
+        ----
+        function (Callable): The function to run
+        *args (Any): Arguments for the function
+        """
+        return await get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _recent(
+        self: "GameHistory", server_id: str, name: Optional[str], limit: int
+    ) -> list[GameResult]:
+        if name is None:
+            rows = self.connection.execute(
+                "SELECT players.game_id, name, opponent, result, players.ended, deck "
+                "FROM (SELECT id FROM games WHERE server = ? "
+                "ORDER BY ended DESC LIMIT ?) AS recent "
+                "JOIN players ON players.game_id = recent.id "
+                "AND (result > 0 OR (result = 0 AND name <= IFNULL(opponent, name))) "
+                "ORDER BY players.ended DESC",
+                (server_id, limit),
+            )
+        else:
+            rows = self.connection.execute(
+                "SELECT game_id, name, opponent, result, ended, deck FROM players "
+                "WHERE server = ? AND name = ? ORDER BY ended DESC LIMIT ?",
+                (server_id, name, limit),
+            )
+        return [GameResult(*row) for row in rows]
+
+    async def recent(
+        self: "GameHistory", server_id: str, name: Optional[str] = None, limit: int = 10
+    ) -> list[GameResult]:
+        """Get the most recent games, from the point of view of the winner.
+
+        Args:
+        ----
+        server_id (str): The server the games were on
+        name (str): Optional, only get games this player played, from their view
+        limit (int): Optional, the number of games to get
+        """
+        return await self.run(self._recent, server_id, name, limit)
+
+    def _head_to_head(
+        self: "GameHistory", server_id: str, name: str, opponent: str
+    ) -> HeadToHead:
+        record = HeadToHead()
+        for result, count in self.connection.execute(
+            "SELECT result, COUNT(*) FROM players "
+            "WHERE server = ? AND name = ? AND opponent = ? GROUP BY result",
+            (server_id, name, opponent),
+        ):
+            if result > 0:
+                record.wins = count
+            elif result < 0:
+                record.losses = count
+            else:
+                record.ties = count
+        return record
+
+    async def head_to_head(
+        self: "GameHistory", server_id: str, name: str, opponent: str
+    ) -> HeadToHead:
+        """Get the record of one player against another.
+
+        Args:
+        ----
+        server_id (str): The server the games were on
+        name (str): The player to get the record of
+        opponent (str): The player they played against
+        """
+        return await self.run(self._head_to_head, server_id, name, opponent)
+
+    async def close(self: "GameHistory") -> None:
+        """Write any buffered games and close the database."""
+        if self.flushing is not None:
+            await self.flushing
+        await self.flush()
+        await self.run(self.connection.close)
+        self.executor.shutdown()
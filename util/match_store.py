@@ -0,0 +1,242 @@
+"""Persist in-flight matches so they survive a restart."""
+import sqlite3
+from dataclasses import dataclass, field
+from json import dumps, loads
+from time import time
+from typing import Optional
+
+
+@dataclass
+class MatchRecord:
+
+    """The saved state of a match."""
+
+    id: str
+    guild_id: str
+    channel_id: str
+    thread_id: str
+    state: int
+    winning_games: int
+    max_games: int
+    current_game: int = 0
+    players: list[str] = field(default_factory=list)
+    scores: dict[str, int] = field(default_factory=dict)
+    recorded_games: list[str] = field(default_factory=list)
+    winner: Optional[str] = None
+
+
+@dataclass
+class PreparedRecord:
+
+    """A saved game code a match is waiting to start."""
+
+    code: str
+    match_id: str
+    message_id: str
+
+
+@dataclass
+class FollowedRecord:
+
+    """A saved game a match is waiting to end."""
+
+    game_id: str
+    match_id: str
+    code: Optional[str]
+    created_time: int
+
+
+class MatchStore:
+
+    """Sqlite store of matches, prepared codes and followed games.
+
+    Only live entries are kept, each transition overwrites the row for the match,
+    so loading takes time proportional to the number of running matches rather
+    than the number of matches ever played.
+    """
+
+    def __init__(self: "MatchStore", path: str = "matches.db") -> None:
+        """Open the store, creating it if needed.
+
+        Args:
+        ----
+        path (str): Optional, the database file
+        """
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS matches (
+                id TEXT PRIMARY KEY,
+                guild_id TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                state INTEGER NOT NULL,
+                winning_games INTEGER NOT NULL,
+                max_games INTEGER NOT NULL,
+                current_game INTEGER NOT NULL,
+                players TEXT NOT NULL,
+                scores TEXT NOT NULL,
+                recorded_games TEXT NOT NULL,
+                winner TEXT,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS prepared (
+                code TEXT PRIMARY KEY,
+                match_id TEXT NOT NULL,
+                message_id TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS followed (
+                game_id TEXT PRIMARY KEY,
+                match_id TEXT NOT NULL,
+                code TEXT,
+                created_time INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS prepared_match ON prepared (match_id);
+            CREATE INDEX IF NOT EXISTS followed_match ON followed (match_id);
+            CREATE INDEX IF NOT EXISTS matches_updated ON matches (updated);
+            """
+        )
+
+    def save(self: "MatchStore", record: MatchRecord) -> None:
+        """Save the current state of a match.
+
+        Args:
+        ----
+        record (MatchRecord): The match state
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO matches VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (
+                record.id,
+                record.guild_id,
+                record.channel_id,
+                record.thread_id,
+                record.state,
+                record.winning_games,
+                record.max_games,
+                record.current_game,
+                dumps(record.players),
+                dumps(record.scores),
+                dumps(record.recorded_games),
+                record.winner,
+                time(),
+            ),
+        )
+
+    def delete(self: "MatchStore", match_id: str) -> None:
+        """Remove a match and anything it was waiting for.
+
+        Args:
+        ----
+        match_id (str): The id of the match
+        """
+        with self.connection:
+            self.connection.execute("BEGIN")
+            for table, column in (
+                ("matches", "id"),
+                ("prepared", "match_id"),
+                ("followed", "match_id"),
+            ):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE {column} = ?",  # noqa: S608
+                    (match_id,),
+                )
+
+    def save_prepared(self: "MatchStore", record: PreparedRecord) -> None:
+        """Save a game code a match is waiting for.
+
+        Args:
+        ----
+        record (PreparedRecord): The prepared code
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO prepared VALUES (?,?,?)",
+            (record.code, record.match_id, record.message_id),
+        )
+
+    def delete_prepared(self: "MatchStore", code: str) -> None:
+        """Forget a prepared game code.
+
+        Args:
+        ----
+        code (str): The game code
+        """
+        self.connection.execute("DELETE FROM prepared WHERE code = ?", (code,))
+
+    def save_followed(self: "MatchStore", record: FollowedRecord) -> None:
+        """Save a game a match is following.
+
+        Args:
+        ----
+        record (FollowedRecord): The followed game
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO followed VALUES (?,?,?,?)",
+            (record.game_id, record.match_id, record.code, record.created_time),
+        )
+
+    def delete_followed(self: "MatchStore", game_id: str) -> None:
+        """Forget a followed game.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        """
+        self.connection.execute("DELETE FROM followed WHERE game_id = ?", (game_id,))
+
+    def load(
+        self: "MatchStore",
+    ) -> tuple[list[MatchRecord], list[PreparedRecord], list[FollowedRecord]]:
+        """Load every saved match, prepared code and followed game."""
+        matches = [
+            MatchRecord(
+                *row[:8],
+                players=loads(row[8]),
+                scores=loads(row[9]),
+                recorded_games=loads(row[10]),
+                winner=row[11],
+            )
+            for row in self.connection.execute(
+                "SELECT * FROM matches ORDER BY updated"
+            )
+        ]
+        prepared = [
+            PreparedRecord(*row)
+            for row in self.connection.execute("SELECT * FROM prepared")
+        ]
+        followed = [
+            FollowedRecord(*row)
+            for row in self.connection.execute("SELECT * FROM followed")
+        ]
+        return matches, prepared, followed
+
+    def compact(self: "MatchStore", max_age: float) -> None:
+        """Drop matches that haven't changed for `max_age` seconds and shrink the log.
+
+        Args:
+        ----
+        max_age (float): Seconds after which an unchanged match is dropped
+        """
+        stale = [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT id FROM matches WHERE updated < ?", (time() - max_age,)
+            )
+        ]
+        for match_id in stale:
+            self.delete(match_id)
+        with self.connection:
+            self.connection.execute("BEGIN")
+            for table in ("prepared", "followed"):
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE match_id NOT IN "  # noqa: S608
+                    "(SELECT id FROM matches)"
+                )
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self: "MatchStore") -> None:
+        """Checkpoint and close the database."""
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.connection.close()
@@ -0,0 +1,252 @@
+"""Live card and deck statistics from the games being played."""
+from asyncio import get_running_loop
+from collections import Counter
+from heapq import heapify, heappush, heapreplace
+from json import dumps, load
+from os import replace
+from typing import Optional
+
+from .cache import TTLCache
+from .datagen import Card
+
+
+class TopK:
+
+    """Approximate the most common keys in a stream using a fixed amount of memory.
+
+    Uses the space saving algorithm, once `capacity` keys are tracked a new key
+    replaces the least common one and inherits its count and wins. Counts are
+    overestimates by at most `min(counts)`, keys more common than that are always
+    tracked. The least common key is found with a heap of counts that is only
+    brought up to date when a key has to be replaced.
+    """
+
+    def __init__(self: "TopK", capacity: int = 1000) -> None:
+        """Create an empty sketch.
+
+        Args:
+        ----
+        capacity (int): Optional, the number of keys to track
+        """
+        self.capacity: int = capacity
+        self.counts: dict[str, list[int]] = {}
+        self.heap: list[tuple[int, str]] = []
+
+    def add(self: "TopK", key: str, *, won: bool = False) -> None:
+        """Count a key.
+
+        Args:
+        ----
+        key (str): The key to count
+        won (bool): Optional, whether to also count a win for the key
+        """
+        entry = self.counts.get(key)
+        if entry is None:
+            if len(self.counts) >= self.capacity:
+                entry = self.counts.pop(self.evict())
+                heapreplace(self.heap, (entry[0], key))
+            else:
+                entry = [0, 0]
+                heappush(self.heap, (0, key))
+            self.counts[key] = entry
+        entry[0] += 1
+        entry[1] += won
+
+    def evict(self: "TopK") -> str:
+        """Get the least common key, leaving its slot in the heap for a new key."""
+        while True:
+            count, key = self.heap[0]
+            current = self.counts[key][0]
+            if count == current:
+                return key
+            heapreplace(self.heap, (current, key))
+
+    def load(self: "TopK", counts: dict[str, list[int]]) -> None:
+        """Replace the tracked keys, such as with a saved copy of `counts`.
+
+        Args:
+        ----
+        counts (dict): The count and wins of each key
+        """
+        self.counts = counts
+        self.heap = [(count, key) for key, (count, _wins) in counts.items()]
+        heapify(self.heap)
+
+    def most_common(self: "TopK", n: int) -> list[tuple[str, int, int]]:
+        """Get the `n` most common keys with their counts and wins.
+
+        Args:
+        ----
+        n (int): The number of keys to get
+        """
+        return sorted(
+            ((key, count, wins) for key, (count, wins) in self.counts.items()),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )[:n]
+
+
+class MetaStats:
+
+    """Card usage, type usage and win rates, updated as each game ends.
+
+    Only cards in the universe are counted, so memory is bounded by the number of
+    cards plus the capacity of the deck sketch. The state is saved to `path` with
+    `checkpoint` and loaded again when created.
+    """
+
+    def __init__(
+        self: "MetaStats",
+        universe: dict[str, Card],
+        path: Optional[str] = "meta.json",
+        deck_capacity: int = 1000,
+        game_ttl: float = 6 * 60 * 60,
+    ) -> None:
+        """Create the statistics, loading the last checkpoint if there is one.
+
+        Args:
+        ----
+        universe (dict): Dictionary that converts card ids to Card objects
+        path (str): Optional, the file to checkpoint to, None to never checkpoint
+        deck_capacity (int): Optional, the number of popular decks to track
+        game_ttl (float): Optional, seconds to remember the decks of a started game
+        """
+        self.universe: dict[str, Card] = universe
+        self.path: Optional[str] = path
+
+        self.games: int = 0
+        self.decks: int = 0
+        self.card_decks: Counter[str] = Counter()
+        self.card_wins: Counter[str] = Counter()
+        self.type_decks: Counter[str] = Counter()
+        self.type_wins: Counter[str] = Counter()
+        self.popular_decks = TopK(deck_capacity)
+
+        self.started = TTLCache(game_ttl, max_size=10000)
+        self.changed: bool = False
+        self.restore()
+
+    def record_start(
+        self: "MetaStats",
+        game_id: str,
+        decks: dict[str, tuple[tuple[str, ...], Optional[str]]],
+    ) -> None:
+        """Remember the decks in a game until it ends.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        decks (dict): The card ids and hash of each player's deck, by player id
+        """
+        self.started.set(game_id, decks)
+
+    def record_end(self: "MetaStats", game_id: str, winner: Optional[str]) -> None:
+        """Count the decks in a finished game.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        winner (str): The id of the player that won, None for a tie
+        """
+        decks = self.started.pop(game_id)
+        if decks is None:
+            return
+        self.games += 1
+        for player_id, (cards, deck_hash) in decks.items():
+            won = player_id == winner
+            known = {card_id for card_id in cards if card_id in self.universe}
+            types = {
+                self.universe[card_id].hermit_type
+                for card_id in known
+                if hasattr(self.universe[card_id], "hermit_type")
+            }
+            self.decks += 1
+            self.card_decks.update(known)
+            self.type_decks.update(types)
+            if won:
+                self.card_wins.update(known)
+                self.type_wins.update(types)
+            if deck_hash is not None:
+                self.popular_decks.add(deck_hash, won=won)
+        self.changed = True
+
+    def card_stats(self: "MetaStats", n: int) -> list[tuple[str, float, float]]:
+        """Get the most used cards with their usage and win rates.
+
+        Args:
+        ----
+        n (int): The number of cards to get
+        """
+        return [
+            (
+                card_id,
+                count / self.decks,
+                self.card_wins[card_id] / count,
+            )
+            for card_id, count in self.card_decks.most_common(n)
+        ]
+
+    def type_stats(self: "MetaStats") -> list[tuple[str, float, float]]:
+        """Get the usage and win rate of each hermit type, most used first."""
+        return [
+            (hermit_type, count / self.decks, self.type_wins[hermit_type] / count)
+            for hermit_type, count in self.type_decks.most_common()
+        ]
+
+    def snapshot(self: "MetaStats") -> str:
+        """Encode the statistics, must be called from the event loop."""
+        return dumps(
+            {
+                "games": self.games,
+                "decks": self.decks,
+                "card_decks": self.card_decks,
+                "card_wins": self.card_wins,
+                "type_decks": self.type_decks,
+                "type_wins": self.type_wins,
+                "popular_decks": self.popular_decks.counts,
+            }
+        )
+
+    def write(self: "MetaStats", data: str) -> None:
+        """Replace the checkpoint file, safe to call from any thread.
+
+        Args:
+        ----
+        data (str): The encoded statistics
+        """
+        with open(f"{self.path}.tmp", "w") as f:
+            f.write(data)
+        replace(f"{self.path}.tmp", self.path)
+
+    async def checkpoint(self: "MetaStats") -> None:
+        """Save the statistics if they have changed since the last checkpoint.
+
+        The statistics are encoded on the event loop, so games ending meanwhile
+        can't change them, and only the file is written in an executor.
+        """
+        if self.path is None or not self.changed:
+            return
+        data = self.snapshot()
+        self.changed = False
+        try:
+            await get_running_loop().run_in_executor(None, self.write, data)
+        except OSError:
+            self.changed = True
+            raise
+
+    def restore(self: "MetaStats") -> None:
+        """Load the last checkpoint, if there is one."""
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                data = load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self.games = data["games"]
+        self.decks = data["decks"]
+        self.card_decks = Counter(data["card_decks"])
+        self.card_wins = Counter(data["card_wins"])
+        self.type_decks = Counter(data["type_decks"])
+        self.type_wins = Counter(data["type_wins"])
+        self.popular_decks.load(data["popular_decks"])
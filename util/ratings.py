@@ -0,0 +1,265 @@
+"""Elo ratings for players, updated as results come in."""
+import sqlite3
+from asyncio import get_running_loop
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class PlayerRating:
+
+    """The rating of a player on one leaderboard."""
+
+    name: str
+    rating: float
+    games: int = 0
+    wins: int = 0
+
+
+class RatingStore:
+
+    """Sqlite backed Elo ratings with a leaderboard kept in order.
+
+    Every leaderboard is a list sorted by rating that is updated in place when a
+    rating changes, so leaderboard and rank queries never sort. Changed ratings are
+    written to the database by `flush` on a thread of their own.
+    """
+
+    def __init__(
+        self: "RatingStore",
+        path: str = "ratings.db",
+        k_factor: float = 32,
+        initial: float = 1500,
+    ) -> None:
+        """Open the ratings, loading every leaderboard.
+
+        Args:
+        ----
+        path (str): Optional, the database file
+        k_factor (float): Optional, the most a rating can change by in one game
+        initial (float): Optional, the rating of new players
+        """
+        self.k_factor: float = k_factor
+        self.initial: float = initial
+        self.executor = ThreadPoolExecutor(1, "ratings")
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ratings (
+                board TEXT NOT NULL,
+                key TEXT NOT NULL,
+                name TEXT NOT NULL,
+                rating REAL NOT NULL,
+                games INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                PRIMARY KEY (board, key)
+            ) WITHOUT ROWID
+            """
+        )
+
+        self.players: dict[str, dict[str, PlayerRating]] = {}
+        self.boards: dict[str, list[tuple[float, str]]] = {}
+        self.dirty: set[tuple[str, str]] = set()
+        for board, key, name, rating, games, wins in self.connection.execute(
+            "SELECT * FROM ratings"
+        ):
+            self.players.setdefault(board, {})[key] = PlayerRating(
+                name, rating, games, wins
+            )
+            self.boards.setdefault(board, []).append((-rating, key))
+        for entries in self.boards.values():
+            entries.sort()
+
+    def get(self: "RatingStore", board: str, name: str) -> Optional[PlayerRating]:
+        """Get the rating of a player, or None if they haven't played.
+
+        Args:
+        ----
+        board (str): The leaderboard to look on
+        name (str): The name of the player
+        """
+        return self.players.get(board, {}).get(name.lower())
+
+    def player(self: "RatingStore", board: str, name: str) -> PlayerRating:
+        """Get the rating of a player, adding them if they haven't played.
+
+        Args:
+        ----
+        board (str): The leaderboard to look on
+        name (str): The name of the player
+        """
+        players = self.players.setdefault(board, {})
+        key = name.lower()
+        if key not in players:
+            players[key] = PlayerRating(name, self.initial)
+            insort(self.boards.setdefault(board, []), (-self.initial, key))
+        return players[key]
+
+    def set_rating(
+        self: "RatingStore", board: str, player: PlayerRating, rating: float
+    ) -> None:
+        """Change the rating of a player and move them on the leaderboard.
+
+        Args:
+        ----
+        board (str): The leaderboard the player is on
+        player (PlayerRating): The player to change
+        rating (float): The new rating
+        """
+        key = player.name.lower()
+        entries = self.boards[board]
+        del entries[bisect_left(entries, (-player.rating, key))]
+        player.rating = rating
+        insort(entries, (-rating, key))
+        self.dirty.add((board, key))
+
+    def expected(self: "RatingStore", rating: float, opponent: float) -> float:
+        """Get the expected score of a player against an opponent.
+
+        Args:
+        ----
+        rating (float): The rating of the player
+        opponent (float): The rating of the opponent
+        """
+        return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+    def record_game(
+        self: "RatingStore", board: str, first: str, second: str, winner: Optional[str]
+    ) -> None:
+        """Update the ratings of two players after a game.
+
+        Args:
+        ----
+        board (str): The leaderboard the game counts for
+        first (str): The name of one player
+        second (str): The name of the other player
+        winner (str): The name of the player that won, None for a tie
+        """
+        player = self.player(board, first)
+        opponent = self.player(board, second)
+        score = 0.5 if winner is None else float(winner == first)
+        change = self.k_factor * (score - self.expected(player.rating, opponent.rating))
+        player.games += 1
+        opponent.games += 1
+        player.wins += winner == first
+        opponent.wins += winner == second
+        self.set_rating(board, player, player.rating + change)
+        self.set_rating(board, opponent, opponent.rating - change)
+
+    def record_results(
+        self: "RatingStore", board: str, results: list[tuple[str, int, int, int]]
+    ) -> None:
+        """Update ratings from an event where opponents weren't recorded.
+
+        Each player is rated as if every game was against the average player in
+        the event.
+
+        Args:
+        ----
+        board (str): The leaderboard the event counts for
+        results (list): The name, wins, ties and losses of each player
+        """
+        if not results:
+            return
+        players = [self.player(board, name) for name, *_ in results]
+        field = sum(player.rating for player in players) / len(players)
+        changes = [
+            self.k_factor
+            * (
+                wins
+                + ties / 2
+                - (wins + ties + losses) * self.expected(player.rating, field)
+            )
+            for player, (_, wins, ties, losses) in zip(players, results, strict=True)
+        ]
+        for player, change, (_, wins, ties, losses) in zip(
+            players, changes, results, strict=True
+        ):
+            player.games += wins + ties + losses
+            player.wins += wins
+            self.set_rating(board, player, player.rating + change)
+
+    def leaderboard(
+        self: "RatingStore", board: str, start: int = 0, count: int = 10
+    ) -> list[PlayerRating]:
+        """Get part of a leaderboard, highest rating first.
+
+        Args:
+        ----
+        board (str): The leaderboard to get
+        start (int): Optional, the rank to start at, from 0
+        count (int): Optional, the number of players to get
+        """
+        players = self.players.get(board, {})
+        return [
+            players[key] for _, key in self.boards.get(board, [])[start : start + count]
+        ]
+
+    def rank(self: "RatingStore", board: str, name: str) -> Optional[int]:
+        """Get the position of a player on a leaderboard, from 1.
+
+        Args:
+        ----
+        board (str): The leaderboard to look on
+        name (str): The name of the player
+        """
+        player = self.get(board, name)
+        if player is None:
+            return None
+        return bisect_left(self.boards[board], (-player.rating, name.lower())) + 1
+
+    def size(self: "RatingStore", board: str) -> int:
+        """Get the number of players on a leaderboard.
+
+        Args:
+        ----
+        board (str): The leaderboard to count
+        """
+        return len(self.boards.get(board, []))
+
+    def row(self: "RatingStore", board: str, key: str) -> tuple:
+        """Get the database row of a player.
+
+        Args:
+        ----
+        board (str): The leaderboard the player is on
+        key (str): The lowercase name of the player
+        """
+        player = self.players[board][key]
+        return (board, key, player.name, player.rating, player.games, player.wins)
+
+    def write(self: "RatingStore", rows: list[tuple]) -> None:
+        """Write rows in one transaction.
+
+        Args:
+        ----
+        rows (list): Rows for the ratings table
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO ratings VALUES (?,?,?,?,?,?)", rows
+            )
+
+    async def flush(self: "RatingStore") -> None:
+        """Write changed ratings to the database.
+
+        Ratings are only marked as written once the transaction commits, and
+        ratings that change again during the write stay marked.
+        """
+        if not self.dirty:
+            return
+        rows = [self.row(board, key) for board, key in self.dirty]
+        await get_running_loop().run_in_executor(self.executor, self.write, rows)
+        for row in rows:
+            if self.row(row[0], row[1]) == row:
+                self.dirty.discard((row[0], row[1]))
+
+    async def close(self: "RatingStore") -> None:
+        """Write changed ratings and close the database."""
+        await self.flush()
+        await get_running_loop().run_in_executor(self.executor, self.connection.close)
+        self.executor.shutdown()
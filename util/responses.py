@@ -0,0 +1,94 @@
+"""Pre-encoded http responses that support conditional requests."""
+from datetime import datetime as dt
+from datetime import timezone
+from gzip import compress as gzip_compress
+from hashlib import sha256
+from typing import Optional
+
+from aiohttp.web import Request, Response
+
+
+class CachedBody:
+
+    """A response body that is encoded once and served with validators."""
+
+    def __init__(
+        self: "CachedBody",
+        body: bytes,
+        content_type: str,
+        cache_control: str = "no-cache",
+        *,
+        compress: bool = False,
+    ) -> None:
+        """Encode a response body.
+
+        Args:
+        ----
+        body (bytes): The response body
+        content_type (str): The mime type of the body
+        cache_control (str): Optional, the Cache-Control header to send
+        compress (bool): Optional, if a gzipped copy should be kept for clients
+        that accept it
+        """
+        self.body: bytes = body
+        self.content_type: str = content_type
+        self.cache_control: str = cache_control
+        self.etag: str = sha256(body).hexdigest()[:32]
+        self.last_modified: dt = dt.now(tz=timezone.utc).replace(microsecond=0)
+        self.gzipped: Optional[bytes] = gzip_compress(body) if compress else None
+        self.gzip_etag: str = f"{self.etag}-gz"
+
+    def not_modified(self: "CachedBody", req: Request, etag: str) -> Optional[str]:
+        """Get the etag of the copy the client already has, or None if it has none.
+
+        Args:
+        ----
+        req (Request): The web request sent
+        etag (str): The etag of the copy that would be sent
+        """
+        if req.if_none_match is not None:
+            etags = (self.etag, self.gzip_etag) if self.gzipped else (self.etag,)
+            for match in req.if_none_match:
+                if match.value == "*":
+                    return etag
+                if match.value in etags:
+                    return match.value
+            return None
+        if req.if_modified_since is not None and (
+            req.if_modified_since >= self.last_modified
+        ):
+            return etag
+        return None
+
+    def respond(self: "CachedBody", req: Request) -> Response:
+        """Create a response for a request, using 304 when nothing changed.
+
+        The gzipped copy has its own etag, as it is a different representation.
+
+        Args:
+        ----
+        req (Request): The web request sent
+        """
+        headers = {"Cache-Control": self.cache_control}
+        if self.gzipped is not None:
+            headers["Vary"] = "Accept-Encoding"
+        gzipped = self.gzipped is not None and "gzip" in req.headers.get(
+            "Accept-Encoding", ""
+        )
+        etag = self.gzip_etag if gzipped else self.etag
+        cached_etag = self.not_modified(req, etag)
+        if cached_etag is not None:
+            response = Response(status=304, headers=headers)
+            etag = cached_etag
+        elif gzipped:
+            headers["Content-Encoding"] = "gzip"
+            response = Response(
+                body=self.gzipped, content_type=self.content_type, headers=headers
+            )
+        else:
+            response = Response(
+                body=self.body, content_type=self.content_type, headers=headers
+            )
+        response.etag = etag
+        response.last_modified = self.last_modified
+        return response
@@ -1,10 +1,14 @@
 """Handles interactions and linking discord and hc-tcg servers."""
 import re
+from asyncio import Semaphore, Task, create_task, gather, shield, wait_for
+from asyncio import TimeoutError as AsyncTimeoutError
 from collections import defaultdict
 from datetime import datetime as dt
 from datetime import timezone
 from enum import Enum
-from typing import Any, Callable, Optional
+from json import dumps
+from time import monotonic
+from typing import Any, Awaitable, Callable, Optional
 
 from aiohttp.web import Application, Request, Response, json_response, post
 from aiohttp.web import get as get_route
@@ -23,23 +27,61 @@ from interactions import (
     SlashContext,
     spread_to_rows,
 )
-from pyjson5 import Json5Exception
-from pyjson5 import decode as decode_json
-from requests import exceptions, get
-from requests import post as send_post
 
-from util import Card, deck_to_hash
+from util import (
+    ApiClient,
+    CachedBody,
+    Card,
+    EditCoalescer,
+    EventQueue,
+    FollowedRecord,
+    GameHistory,
+    MatchRecord,
+    MatchStore,
+    MetaStats,
+    PreparedRecord,
+    RatingStore,
+    TTLCache,
+    deck_to_hash,
+)
+from util.webhooks import (
+    GAME_END_SCHEMA,
+    GAME_START_SCHEMA,
+    PRIVATE_CANCEL_SCHEMA,
+    GameEndPayload,
+    GameStartPayload,
+    PrivateCancelPayload,
+    webhook,
+)
+
+ANNOUNCEMENT_LIMIT = 10
+EMOJI_PATTERN = re.compile(r"<:(\w+):\d{18,19}>")
+MENTION_PATTERN = re.compile(r"<@&?(\d{18,19})>")
 
 
 class GamePlayer:
 
     """A representation of a player in a game."""
 
+    __slots__ = (
+        "_deck_hash",
+        "_universe",
+        "board",
+        "cards",
+        "id",
+        "lives",
+        "minecraft_name",
+        "name",
+    )
+
     def __init__(
-        self: "GamePlayer", data: dict[str, Any], universe: dict[str, int]
+        self: "GamePlayer", data: dict[str, Any], universe: dict[str, Card]
     ) -> None:
         """Represent a player in a game.
 
+        Only the card ids and board are kept from `data`, the deck hash is built
+        when it is first accessed.
+
         Args:
         ----
         data (dict): Player information
@@ -49,21 +91,38 @@ class GamePlayer:
         self.name: str = data["censoredPlayerName"]
         self.minecraft_name: str = data["minecraftName"]
         self.lives: int = data["lives"]
-
-        self.deck_hash: str = deck_to_hash(
-            (
-                card["cardId"]
-                for card in data["pile"] + data["hand"] + data["discarded"]
-            ),
-            universe,
+        self.cards: tuple[str, ...] = tuple(
+            card["cardId"]
+            for pile in ("pile", "hand", "discarded")
+            for card in data[pile]
         )
         self.board: dict = data["board"]
 
+        self._universe: dict[str, Card] = universe
+        self._deck_hash: Optional[str] = None
+
+    @property
+    def deck_hash(self: "GamePlayer") -> str:
+        """The hash of the player's deck."""
+        if self._deck_hash is None:
+            self._deck_hash = deck_to_hash(self.cards, self._universe)
+        return self._deck_hash
+
+    @property
+    def safe_deck_hash(self: "GamePlayer") -> Optional[str]:
+        """The hash of the player's deck, or None if it has unknown cards."""
+        try:
+            return self.deck_hash
+        except KeyError:
+            return None
+
 
 class Game:
 
     """Store data about a game."""
 
+    __slots__ = ("code", "created", "end_callback", "id", "player_names", "players")
+
     def __init__(self: "Game", data: dict[str, Any], universe: dict[str, Card]) -> None:
         """Store data about a game.
 
@@ -105,6 +164,52 @@ class Game:
         )
 
 
+class GameSnapshot:
+
+    """A parsed copy of a server's game list with lookup indexes."""
+
+    def __init__(
+        self: "GameSnapshot", games: list[Game], *, reachable: bool = True
+    ) -> None:
+        """Index a list of games.
+
+        Args:
+        ----
+        games (list[Game]): The games on the server
+        reachable (bool): If the server responded when fetching the games
+        """
+        self.games: list[Game] = sorted(games, key=lambda game: game.created)
+        self.fetched: float = monotonic()
+        self.reachable: bool = reachable
+
+        self.by_id: dict[str, Game] = {game.id: game for game in self.games}
+        self.by_code: dict[str, Game] = {
+            game.code: game for game in self.games if game.code
+        }
+        self.by_player: dict[str, Game] = {}
+        for game in self.games:
+            for name in game.player_names:
+                self.by_player.setdefault(name, game)
+
+    @property
+    def age(self: "GameSnapshot") -> float:
+        """Seconds since the games were fetched."""
+        return monotonic() - self.fetched
+
+    def find(self: "GameSnapshot", search: str) -> Optional[Game]:
+        """Find a game by id, player name or code.
+
+        Args:
+        ----
+        search (str): The game id, player name or game code
+        """
+        return (
+            self.by_id.get(search)
+            or self.by_player.get(search)
+            or self.by_code.get(search)
+        )
+
+
 class MatchStateEnum(Enum):
 
     """Possible match states."""
@@ -136,33 +241,40 @@ class Match:
     def __init__(
         self: "Match",
         client: Client,
-        ctx: SlashContext,
+        ctx: Optional[SlashContext],
         server: "Server",
         winning_games: int,
         max_games: int = 100,
+        on_end: Optional[Callable[["Match"], None]] = None,
     ) -> None:
         """Create a match.
 
         Args:
         ----
         client (Client): The bot client
-        ctx (SlashContext): The original command context
+        ctx (SlashContext): The original command context, None for restored matches
         server (Server): The server this match is on
         winning_games (int): The number of games a player needs to win
         max_games (int): The maximum number of games to play
+        on_end (Callable): Optional, called with the match once it has ended
         """
         self.client: Client = client
-        self.context: SlashContext = ctx
+        self.context: Optional[SlashContext] = ctx
         self.server: Server = server
         self.winning_games: int = winning_games
         self.max_games: int = max_games
+        self.on_end: Optional[Callable[[Match], None]] = on_end
         self.current_game: int = 0
+        self.announced_game: int = 0
+        self.game_code: Optional[str] = None
+        self.last_active: float = monotonic()
 
         self.state: MatchStateEnum = MatchStateEnum.WAITING_FOR_PLAYERS
         self.players: list[str] = []
         self.game: Optional[Game] = None
         self.game_message: Optional[Message] = None
         self.scores: defaultdict = defaultdict(int)
+        self.recorded_games: set[str] = set()
         self.winner: Optional[str] = None
 
         self.button_join = Button(
@@ -182,16 +294,95 @@ class Match:
             color=STATE_COLORS[self.state],
             timestamp=dt.now(tz=timezone.utc),
         ).set_footer("Bot by Tyrannicodin16")
+        self.message_editor = EditCoalescer(self.update_message)
+
+    @classmethod
+    def restore(
+        cls: type["Match"],
+        client: Client,
+        server: "Server",
+        record: MatchRecord,
+        message: Message,
+        thread: GuildPrivateThread,
+        on_end: Optional[Callable[["Match"], None]] = None,
+    ) -> "Match":
+        """Rebuild a match saved before a restart.
+
+        Args:
+        ----
+        client (Client): The bot client
+        server (Server): The server this match is on
+        record (MatchRecord): The saved match state
+        message (Message): The match message
+        thread (GuildPrivateThread): The match thread
+        on_end (Callable): Optional, called with the match once it has ended
+        """
+        match = cls(
+            client, None, server, record.winning_games, record.max_games, on_end
+        )
+        match.message = message
+        match.thread = thread
+        match.id = record.id
+        match.guild_id = record.guild_id
+        match.channel_id = record.channel_id
+        match.current_game = record.current_game
+        match.announced_game = record.current_game
+        match.players = record.players
+        match.scores.update(record.scores)
+        match.recorded_games = set(record.recorded_games)
+        match.winner = record.winner
+        if message.embeds:
+            match.emb = message.embeds[0]
+        match.state = MatchStateEnum(record.state)
+        match.button_join.disabled = match.state != MatchStateEnum.WAITING_FOR_PLAYERS
+        match.button_leave.disabled = match.state != MatchStateEnum.WAITING_FOR_PLAYERS
+        return match
+
+    def record(self: "Match") -> MatchRecord:
+        """Get the state of the match to save."""
+        return MatchRecord(
+            self.id,
+            self.guild_id,
+            self.channel_id,
+            str(self.thread.id),
+            self.state.value,
+            self.winning_games,
+            self.max_games,
+            self.current_game,
+            self.players,
+            dict(self.scores),
+            list(self.recorded_games),
+            self.winner,
+        )
+
+    def persist(self: "Match") -> None:
+        """Save the match so it can be restored after a restart."""
+        if self.server.store is not None:
+            self.server.store.save(self.record())
 
     async def set_state(self: "Match", new_state: MatchStateEnum) -> None:
-        """Properly update the state value."""
+        """Properly update the state value.
+
+        Message edits are coalesced, apart from the final one when the match ends.
+        """
         self.state = new_state
+        self.last_active = monotonic()
         self.emb.title = STATE_TEXT[self.state].format(
             winner=self.winner, game=self.current_game
         )
         self.emb.color = STATE_COLORS[self.state]
         self.button_join.disabled = self.state != MatchStateEnum.WAITING_FOR_PLAYERS
         self.button_leave.disabled = self.state != MatchStateEnum.WAITING_FOR_PLAYERS
+        self.persist()
+        if self.state == MatchStateEnum.ENDED:
+            await self.message_editor.flush()
+            if self.on_end is not None:
+                self.on_end(self)
+        else:
+            self.message_editor.request()
+
+    async def update_message(self: "Match") -> None:
+        """Edit the match message to show the current state."""
         await self.message.edit(
             embed=self.emb,
             components=spread_to_rows(self.button_join, self.button_leave),
@@ -204,6 +395,8 @@ class Match:
             components=spread_to_rows(self.button_join, self.button_leave),
         )
         self.id: str = str(self.message.id)
+        self.guild_id: str = str(self.context.guild_id)
+        self.channel_id: str = str(self.context.channel_id)
         self.thread: GuildPrivateThread = (
             await self.context.channel.create_private_thread(
                 "Match id: " + str(self.id),
@@ -214,10 +407,16 @@ class Match:
         await self.thread.join()
 
     async def start_game(self: "Match") -> None:
-        """Create a game."""
-        self.current_game += 1
-        code = self.server.create_game()
-        await self.set_state(MatchStateEnum.STARTING_GAME)
+        """Create a game.
+
+        If announcing the last game created failed it is announced again instead,
+        so retrying doesn't create a second game.
+        """
+        if self.announced_game == self.current_game:
+            self.current_game += 1
+            self.game_code = await self.server.create_game()
+            await self.set_state(MatchStateEnum.STARTING_GAME)
+        code = self.game_code
 
         game_embed = Embed(
             title=f"Game {self.current_game}",
@@ -230,13 +429,14 @@ class Match:
             content="".join(f"<@{player_id}>" for player_id in self.players),
             embeds=game_embed,
         )
-        self.server.prepared_games[code] = (self.handle_game_start, message, game_embed)
+        self.server.prepare_game(code, self.handle_game_start, message, game_embed)
+        self.announced_game = self.current_game
 
     async def handle_game_start(self: "Match", game: Game) -> None:
         """Update the game state on start and subscribe to end event."""
         self.game = game
         self.game.end_callback = self.handle_game_end
-        self.server.followed_games[self.game.id] = self.game
+        self.server.follow_game(self.game)
         await self.set_state(MatchStateEnum.PLAYING)
 
     async def handle_game_end(self: "Match", game_info: dict) -> None:
@@ -244,15 +444,22 @@ class Match:
         player_dict: dict[str, str] = dict(
             zip(game_info["playerIds"], game_info["playerNames"])
         )
-        game_winner: str = player_dict[game_info["endInfo"]["winner"]]
-        self.scores[game_winner] += 1
-        self.emb.add_field(
-            f"Game {self.current_game} - {game_winner} won",
-            " - ".join(
-                f"{player} ({self.scores[player]})"
-                for player in sorted(game_info["playerNames"])
-            ),
-        )
+        game_winner = player_dict.get(game_info["endInfo"].get("winner"))
+        if game_info["id"] not in self.recorded_games:  # Retries don't score twice
+            self.recorded_games.add(game_info["id"])
+            if game_winner is not None:
+                self.scores[game_winner] += 1
+            self.emb.add_field(
+                f"Game {self.current_game} - "
+                + (f"{game_winner} won" if game_winner else "draw"),
+                " - ".join(
+                    f"{player} ({self.scores[player]})"
+                    for player in sorted(game_info["playerNames"])
+                ),
+            )
+        if game_winner is None:  # Draws are replayed
+            await self.start_game()
+            return
         if self.scores[game_winner] == self.winning_games:
             self.winner = game_winner
             await self.thread.edit(archived=True, locked=True, reason="Match end")
@@ -262,6 +469,7 @@ class Match:
             self.winner = max(self.scores.items(), key=lambda x: x[1])[0]
             await self.thread.edit(archived=True, locked=True, reason="Match end")
             await self.set_state(MatchStateEnum.ENDED)
+            return
         await self.start_game()
 
 
@@ -279,6 +487,8 @@ class Server:
         admins: Optional[list[str]] = None,
         tracked_forums: Optional[dict[str, list[str]]] = None,
         update_channel: Optional[str] = None,
+        games_ttl: float = 30,
+        games_max_stale: float = 90,
     ) -> None:
         """Create a Server object.
 
@@ -293,6 +503,9 @@ class Server:
         features, if blank allows all users to use privileged features
         tracked_forums (list[str]): Dictionary with channel ids and tags to ignore
         update_channel (str): The channel to get server updates from
+        games_ttl (float): Seconds the game list is reused for before refreshing
+        games_max_stale (float): Seconds an expired game list is still served for
+        while it is refreshed in the background
         """
         if admins is None:
             admins = []
@@ -301,6 +514,7 @@ class Server:
 
         self.server_id: str = server_id
         self.universe: Optional[dict[str, Card]] = None
+        self.api: ApiClient = ApiClient()
 
         self.server_url: str = server_url
         self.api_url: str = server_url + "/api"
@@ -310,9 +524,18 @@ class Server:
         self.admin_roles: list[str] = admins
         self.tracked_forums: dict[str, list[str]] = tracked_forums
         self.update_channel: Optional[str] = update_channel
+        self.games_ttl: float = games_ttl
+        self.games_max_stale: float = games_max_stale
 
+        self._snapshot: Optional[GameSnapshot] = None
+        self._refresh: Optional[Task] = None
+
+        self.store: Optional[MatchStore] = None
         self.followed_games: dict[str, Game] = {}
         self.prepared_games: dict[str, tuple[Callable, Message, Embed]] = {}
+        self.followed_times: dict[str, float] = {}
+        self.prepared_times: dict[str, float] = {}
+        self.replaced_codes = TTLCache(15 * 60)
 
     def authorize_user(self: "Server", member: Member) -> bool:
         """Check if a user is allowed to use privileged commands."""
@@ -323,44 +546,220 @@ class Server:
 
         return admin_user or admin_role
 
-    def get_games(self: "Server") -> list[Game]:
-        """Get games on the server."""
-        try:
-            game_data = get(
-                f"{self.api_url}/games",
-                headers={"api-key": self.server_key},
-                timeout=20,
-            ).json()
-            return [Game(game_dict, self.universe) for game_dict in game_data]
-        except (ConnectionError, exceptions.JSONDecodeError, exceptions.Timeout):
+    async def get_game_data(
+        self: "Server", timeout: float = 20
+    ) -> Optional[list[dict[str, Any]]]:
+        """Get the raw game list from the server, or None if it couldn't be reached.
+
+        Args:
+        ----
+        timeout (float): Optional, seconds to wait for the server to respond
+        """
+        game_data = await self.api.request(
+            "GET", self.api_url, "games", self.server_key, timeout
+        )
+        return game_data if isinstance(game_data, list) else None
+
+    async def get_games(self: "Server", timeout: float = 20) -> list[Game]:
+        """Get games on the server.
+
+        Args:
+        ----
+        timeout (float): Optional, seconds to wait for the server to respond
+        """
+        game_data = await self.get_game_data(timeout)
+        if game_data is None:
             return []
+        return [Game(game_dict, self.universe) for game_dict in game_data]
 
-    def create_game(self: "Server") -> Optional[str]:
-        """Create a server game."""
+    async def refresh_games(self: "Server", timeout: float = 20) -> GameSnapshot:
+        """Fetch the game list and replace the cached snapshot.
+
+        If the server can't be reached the previous snapshot is kept until it is
+        older than `games_max_stale`, after that the server is marked unreachable.
+
+        Args:
+        ----
+        timeout (float): Optional, seconds to wait for the server to respond
+        """
+        game_data = await self.get_game_data(timeout)
+        if game_data is None:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.age >= self.games_max_stale:
+                self._snapshot = GameSnapshot([], reachable=False)
+            return self._snapshot
+        self._snapshot = GameSnapshot(
+            [Game(game_dict, self.universe) for game_dict in game_data]
+        )
+        return self._snapshot
+
+    async def get_snapshot(self: "Server", timeout: float = 20) -> GameSnapshot:
+        """Get the cached game list, refreshing it when it has expired.
+
+        Snapshots older than `games_ttl` but newer than `games_max_stale` are
+        returned straight away and refreshed in the background.
+
+        Args:
+        ----
+        timeout (float): Optional, seconds to wait for the server to respond
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age < self.games_ttl:
+            return snapshot
+        if self._refresh is None or self._refresh.done():
+            self._refresh = create_task(self.refresh_games(timeout))
+        if snapshot is not None and snapshot.age < self.games_max_stale:
+            return snapshot
+        return await shield(self._refresh)
+
+    async def count_games(self: "Server", timeout: float = 5) -> Optional[int]:
+        """Count the games on the server, or None if it couldn't be reached.
+
+        Args:
+        ----
+        timeout (float): Optional, deadline for the whole request in seconds
+        """
         try:
-            return send_post(
-                f"{self.api_url}/createGame",
-                headers={"api-key": self.server_key},
-                timeout=20,
-            ).json()["code"]
-        except (
-            ConnectionError,
-            exceptions.JSONDecodeError,
-            exceptions.Timeout,
-            KeyError,
-        ):
+            snapshot = await wait_for(self.get_snapshot(timeout), timeout)
+        except AsyncTimeoutError:
             return None
+        return len(snapshot.games) if snapshot.reachable else None
+
+    async def create_game(self: "Server") -> Optional[str]:
+        """Create a server game."""
+        game_data = await self.api.request(
+            "POST", self.api_url, "createGame", self.server_key
+        )
+        if not isinstance(game_data, dict):
+            return None
+        return game_data.get("code")
 
     async def handle_private_cancel(self: "Server", code: str) -> None:
-        """Restart private game if game cancelled."""
-        if code not in self.prepared_games.keys():
-            return
-        new_code = self.create_game()
-        event, message, game_embed = self.prepared_games.pop(code)
-        game_embed.description = f"Code: {new_code}"
+        """Restart private game if game cancelled.
 
+        The new code is prepared before the message is edited, a retry after the
+        edit failed only edits the message again.
+        """
+        if code in self.prepared_games.keys():
+            new_code = await self.create_game()
+            event, message, game_embed = self.unprepare_game(code)
+            game_embed.description = f"Code: {new_code}"
+            self.prepare_game(new_code, event, message, game_embed)
+            self.replaced_codes.set(code, new_code)
+        new_code = self.replaced_codes.get(code)
+        if new_code not in self.prepared_games.keys():
+            return  # Not a match's game, or the new game already started
+        _, message, game_embed = self.prepared_games[new_code]
         await message.edit(embed=game_embed)
-        self.prepared_games[new_code] = (event, message, game_embed)
+
+    def prepare_game(
+        self: "Server", code: str, callback: Callable, message: Message, embed: Embed
+    ) -> None:
+        """Call `callback` when a game with `code` starts.
+
+        Args:
+        ----
+        code (str): The code of the private game
+        callback (Callable): Called with the game when it starts
+        message (Message): The message showing the code
+        embed (Embed): The embed in the message
+        """
+        self.prepared_games[code] = (callback, message, embed)
+        self.prepared_times[code] = monotonic()
+        match_id = self.match_id(callback)
+        if self.store is not None and match_id is not None and code is not None:
+            self.store.save_prepared(PreparedRecord(code, match_id, str(message.id)))
+
+    def unprepare_game(
+        self: "Server", code: str
+    ) -> Optional[tuple[Callable, Message, Embed]]:
+        """Stop waiting for a game code to start.
+
+        Args:
+        ----
+        code (str): The code of the private game
+        """
+        self.prepared_times.pop(code, None)
+        if self.store is not None and code is not None:
+            self.store.delete_prepared(code)
+        return self.prepared_games.pop(code, None)
+
+    def follow_game(self: "Server", game: Game) -> None:
+        """Call the game's end callback when it ends.
+
+        Args:
+        ----
+        game (Game): The game to follow
+        """
+        self.followed_games[game.id] = game
+        self.followed_times[game.id] = monotonic()
+        match_id = self.match_id(game.end_callback)
+        if self.store is not None and match_id is not None:
+            self.store.save_followed(
+                FollowedRecord(
+                    game.id, match_id, game.code, int(game.created.timestamp() * 1000)
+                )
+            )
+
+    def unfollow_game(self: "Server", game_id: str) -> Optional[Game]:
+        """Stop following a game.
+
+        Args:
+        ----
+        game_id (str): The id of the game
+        """
+        self.followed_times.pop(game_id, None)
+        if self.store is not None:
+            self.store.delete_followed(game_id)
+        return self.followed_games.pop(game_id, None)
+
+    @staticmethod
+    def match_id(callback: Callable) -> Optional[str]:
+        """Get the id of the match a callback belongs to, if any.
+
+        Args:
+        ----
+        callback (Callable): A game start or end callback
+        """
+        match = getattr(callback, "__self__", None)
+        return match.id if isinstance(match, Match) else None
+
+    def release_match(self: "Server", match_id: str) -> None:
+        """Stop waiting for every code and game that belongs to a match.
+
+        Args:
+        ----
+        match_id (str): The id of the match
+        """
+        for code in [
+            code
+            for code, (callback, _message, _embed) in self.prepared_games.items()
+            if self.match_id(callback) == match_id
+        ]:
+            self.unprepare_game(code)
+        for game_id in [
+            game_id
+            for game_id, game in self.followed_games.items()
+            if self.match_id(game.end_callback) == match_id
+        ]:
+            self.unfollow_game(game_id)
+
+    def sweep(self: "Server", ttl: float) -> None:
+        """Forget codes and games that have been tracked for longer than `ttl`.
+
+        Args:
+        ----
+        ttl (float): Seconds to keep tracking a code or game for
+        """
+        cutoff = monotonic() - ttl
+        for code in [
+            code for code, since in self.prepared_times.items() if since < cutoff
+        ]:
+            self.unprepare_game(code)
+        for game_id in [
+            game_id for game_id, since in self.followed_times.items() if since < cutoff
+        ]:
+            self.unfollow_game(game_id)
 
     @property
     def file_prefix(self: "Server") -> None:
@@ -379,6 +778,14 @@ class ServerManager:
         bot_server: Application,
         scheduler: AsyncIOScheduler,
         universe: dict[str, Card],
+        status_timeout: float = 5,
+        announcement_cache_ttl: float = 600,
+        tracking_ttl: float = 6 * 60 * 60,
+        store_path: str = "matches.db",
+        history_path: str = "history.db",
+        meta_path: Optional[str] = "meta.json",
+        ratings_path: str = "ratings.db",
+        member_lookups: int = 8,
     ) -> None:
         """Manage multiple servers and their functionality.
 
@@ -389,18 +796,62 @@ class ServerManager:
         bot_server (Application): The web server hc-tcg servers send requests to
         scheduler (AsyncIOScheduler): Sheduler for repeating tasks
         universe (dict): Dictionary that converts card ids to Card objects
+        status_timeout (float): Optional, seconds to wait for each server when
+        updating the status
+        announcement_cache_ttl (float): Optional, seconds to remember role and member
+        names for
+        tracking_ttl (float): Optional, seconds to keep waiting for a prepared game
+        code or followed game for
+        store_path (str): Optional, the file running matches are saved to
+        history_path (str): Optional, the file finished games are saved to
+        meta_path (str): Optional, the file card statistics are saved to
+        ratings_path (str): Optional, the file player ratings are saved to
+        member_lookups (int): Optional, the number of members fetched at once
         """
         self.discord_links = {server.guild_id: server for server in servers}
         self.server_links = {server.guild_key: server for server in servers}
+        self.api = ApiClient()
+        self.match_store = MatchStore(store_path)
+        self.history = GameHistory(history_path)
+        self.meta = MetaStats(universe, meta_path)
+        self.ratings = RatingStore(ratings_path)
+        self.ended_games = TTLCache(tracking_ttl, max_size=10000)
         for server in servers:
             server.universe = universe
+            server.api = self.api
+            server.store = self.match_store
 
         self.client = client
         self.universe = universe
+        self.scheduler = scheduler
+        self.tracking_ttl = tracking_ttl
+        self.gauges: dict[str, Callable[[], int]] = {
+            "followed_games": lambda: sum(
+                len(server.followed_games) for server in servers
+            ),
+            "prepared_games": lambda: sum(
+                len(server.prepared_games) for server in servers
+            ),
+        }
+        self.status_timeout = status_timeout
+        self.events = EventQueue()
+
+        self.update_channels: dict[str, Server] = {
+            server.update_channel: server for server in servers if server.update_channel
+        }
+        self.announcements: dict[str, list[tuple[int, str, str]]] = {}
+        self.roles = TTLCache(announcement_cache_ttl)
+        self.members = TTLCache(announcement_cache_ttl, max_size=10000)
+        self.member_lookups = Semaphore(member_lookups)
 
-        self.updates: dict[str, list[str]] = {"updates": [], "timestamps": []}
+        self.updates: dict[str, list[str]] = {}
+        self.set_updates({"updates": [], "timestamps": []})
 
         scheduler.add_job(self.update_status, IntervalTrigger(minutes=2))
+        scheduler.add_job(self.sweep, IntervalTrigger(minutes=10))
+        scheduler.add_job(self.history.flush, IntervalTrigger(seconds=5))
+        scheduler.add_job(self.meta.checkpoint, IntervalTrigger(minutes=5))
+        scheduler.add_job(self.ratings.flush, IntervalTrigger(minutes=1))
 
         bot_server.add_routes(
             [
@@ -408,181 +859,395 @@ class ServerManager:
                 post("/admin/game_start", self.on_game_start),
                 post("/admin/private_cancel", self.on_private_cancel),
                 get_route("/updates", self.get_updates),
+                get_route("/metrics", self.get_metrics),
             ]
         )
 
-    async def on_game_end(self: "ServerManager", req: Request) -> Response:
+    def enqueue(
+        self: "ServerManager",
+        key: str,
+        callback: Callable[..., Awaitable[None]],
+        *args: Any,  # noqa: ANN401
+    ) -> Response:
+        """Queue an event for processing and acknowledge the request.
+
+        Args:
+        ----
+        key (str): Events with the same key are processed in order
+        callback (Callable): The coroutine function that processes the event
+        *args (Any): Arguments to call the callback with
+        """
+        if not self.events.submit(key, callback, *args):
+            return Response(status=503, headers={"Retry-After": "1"})
+        return Response(status=202)
+
+    @webhook(GAME_END_SCHEMA)
+    async def on_game_end(
+        self: "ServerManager", server: Server, json: GameEndPayload
+    ) -> Response:
         """Call when a server sends a request to the game_end api endpoint.
 
         Args:
         ----
-        req (Request): The web request sent
+        server (Server): The server that sent the request
+        json (GameEndPayload): The validated request data
         """
-        try:
-            json: dict = decode_json((await req.content.read()).decode())
-        except Json5Exception:
-            return Response(status=400, reason="Invalid json payload")
-        api_key = req.headers.get("api-key")
-        if (
-            api_key not in self.server_links.keys()
-            or self.server_links[api_key].guild_key != api_key
-        ):
-            print(f"Recieved request with invalid api key or url: {api_key}")
-            return Response(status=403)
-
-        required_keys = [
-            "createdTime",
-            "id",
-            "code",
-            "playerIds",
-            "playerNames",
-            "endInfo",
-            "endTime",
-        ]
-        if not all(requiredKey in json.keys() for requiredKey in required_keys):
-            keys = "\n".join(json.keys())
-            print(f"Invalid data:\n {keys}")
-            return Response(status=400)
+        json["endInfo"].pop("deadPlayerIds", None)
+        return self.enqueue(json["id"], self.process_game_end, server, json)
 
-        server = self.server_links[api_key]
-        json["endInfo"].pop("deadPlayerIds")
+    async def process_game_end(
+        self: "ServerManager", server: Server, json: GameEndPayload
+    ) -> None:
+        """Record a finished game and pass it to whatever is following it.
+
+        Args:
+        ----
+        server (Server): The server the game was on
+        json (GameEndPayload): The game end data
+        """
+        if self.ended_games.get(json["id"]) is None:  # Retries aren't counted twice
+            self.ended_games.set(json["id"], json["endTime"])
+            self.history.record_end(server.server_id, json)
+            self.meta.record_end(json["id"], json["endInfo"].get("winner"))
+            if len(json["playerNames"]) == 2:
+                names = dict(zip(json["playerIds"], json["playerNames"], strict=True))
+                winner = names.get(json["endInfo"].get("winner"))
+                self.ratings.record_game(server.server_id, *json["playerNames"], winner)
         if json["id"] in server.followed_games.keys():
             await server.followed_games[json["id"]].end_callback(json)
-        return Response()
+            server.unfollow_game(json["id"])
 
-    async def on_game_start(self: "ServerManager", req: Request) -> Response:
+    @webhook(GAME_START_SCHEMA)
+    async def on_game_start(
+        self: "ServerManager", server: Server, json: GameStartPayload
+    ) -> Response:
         """Call when a server sends a request to the game_start api endpoint.
 
         Args:
         ----
-        req (Request): The web request sent
+        server (Server): The server that sent the request
+        json (GameStartPayload): The validated request data
         """
-        try:
-            json: dict = decode_json((await req.content.read()).decode())
-        except Json5Exception:
-            return Response(status=400, reason="Invalid json payload")
-        api_key = req.headers.get("api-key")
-        if (
-            api_key not in self.server_links.keys()
-            or self.server_links[api_key].guild_key != api_key
-        ):
-            print(f"Recieved request with invalid api key or url: {api_key}")
-            return Response(status=403)
-
-        required_keys = [
-            "createdTime",
-            "id",
-            "code",
-            "playerIds",
-            "playerNames",
-            "state",
-        ]
-        if not all(requiredKey in json.keys() for requiredKey in required_keys):
-            keys = "\n- ".join(json.keys())
-            print(f"Invalid data:\n {keys}")
-            return Response(status=400)
+        return self.enqueue(json["id"], self.process_game_start, server, json)
 
-        server = self.server_links[api_key]
+    async def process_game_start(
+        self: "ServerManager", server: Server, json: GameStartPayload
+    ) -> None:
+        """Remember the decks in a started game and pass it to its match.
+
+        Args:
+        ----
+        server (Server): The server the game is on
+        json (GameStartPayload): The game start data
+        """
+        game = Game(json, self.universe)
+        decks = {player.id: player.safe_deck_hash for player in game.players}
+        self.history.record_start(game.id, decks)
+        self.meta.record_start(
+            game.id,
+            {player.id: (player.cards, decks[player.id]) for player in game.players},
+        )
         if json["code"] in server.prepared_games.keys():
-            await server.prepared_games[json["code"]][0](Game(json, self.universe))
-        return Response()
+            await server.prepared_games[json["code"]][0](game)
+            server.unprepare_game(json["code"])
 
-    async def on_private_cancel(self: "ServerManager", req: Request) -> None:
+    @webhook(PRIVATE_CANCEL_SCHEMA)
+    async def on_private_cancel(
+        self: "ServerManager", server: Server, json: PrivateCancelPayload
+    ) -> Response:
         """Call when a server sends a request to the private_cancel api endpoint.
 
         Args:
         ----
-        req (Request): The web request sent
+        server (Server): The server that sent the request
+        json (PrivateCancelPayload): The validated request data
         """
-        try:
-            json: dict = decode_json((await req.content.read()).decode())
-        except Json5Exception:
-            return Response(status=400, reason="Invalid json payload")
-        api_key = req.headers.get("api-key")
-        if (
-            api_key not in self.server_links.keys()
-            or self.server_links[api_key].guild_key != api_key
-        ):
-            print(f"Recieved request with invalid api key or url: {api_key}")
-            return Response(status=403)
-
-        required_keys = ["code"]
-        if not all(requiredKey in json.keys() for requiredKey in required_keys):
-            keys = "\n- ".join(json.keys())
-            print(f"Invalid data:\n {keys}")
-            return Response(status=400)
-
-        server = self.server_links[api_key]
-        if json["code"] in server.prepared_games.keys():
-            await server.handle_private_cancel(json["code"])
-        return Response()
+        return self.enqueue(json["code"], server.handle_private_cancel, json["code"])
 
     async def update_status(self: "ServerManager") -> None:
-        """Update bot status with game count."""
-        done_servers: list[Server] = []
-        games: int = 0
-        for server in self.server_links.values():
-            if server in done_servers:
-                continue
-            done_servers.append(server)
-            try:
-                games += len(
-                    get(
-                        f"{server.api_url}/games",
-                        headers={"api-key": server.server_key},
-                        timeout=5,
-                    ).json()
-                )
-            except (
-                ConnectionError,
-                exceptions.InvalidJSONError,
-                exceptions.Timeout,
-            ) as e:
-                print(e)
+        """Update bot status with the game count from every reachable server."""
+        counts = await gather(
+            *(
+                server.count_games(self.status_timeout)
+                for server in set(self.server_links.values())
+            )
+        )
+        reachable = [count for count in counts if count is not None]
+        status = "hc-tcg.online"
+        if reachable:
+            games = sum(reachable)
+            status = f"{status} ({games} game{'' if games == 1 else 's'})"
         await self.client.change_presence(
-            activity=Activity("hc-tcg.online", ActivityType.PLAYING)
+            activity=Activity(status, ActivityType.PLAYING)
+        )
+
+    async def update_announcements(
+        self: "ServerManager", *, full: bool = False
+    ) -> None:
+        """Get new updates from every update channel and add them to the endpoint.
+
+        Args:
+        ----
+        full (bool): Optional, rebuild the updates from scratch so edited and
+        deleted messages are picked up
+        """
+        await gather(
+            *(
+                self.fetch_announcements(channel_id, server, full=full)
+                for channel_id, server in self.update_channels.items()
+            )
         )
+        self.publish_announcements()
 
-    async def update_announcements(self: "ServerManager") -> None:
-        """Get updates from servers and add them to the endpoint."""
-        self.updates = {"updates": [], "timestamps": []}
+    async def fetch_announcements(
+        self: "ServerManager", channel_id: str, server: Server, *, full: bool = False
+    ) -> None:
+        """Fetch messages posted in an update channel since it was last checked.
 
-        for server in self.server_links.values():
-            if server.update_channel is None:
-                continue
-            channel = await self.client.fetch_channel(server.update_channel)
-            if channel is None:
-                continue
+        Args:
+        ----
+        channel_id (str): The id of the update channel
+        server (Server): The server the channel belongs to
+        full (bool): Optional, fetch and format every message again
+        """
+        channel = await self.client.fetch_channel(channel_id)
+        if channel is None:
+            return
+        known = self.announcements.get(channel_id)
+        if full or not known:
+            messages = await channel.fetch_messages(limit=ANNOUNCEMENT_LIMIT)
+        else:
+            messages = await channel.fetch_messages(
+                limit=ANNOUNCEMENT_LIMIT, after=known[0][0]
+            )
+            if len(messages) == ANNOUNCEMENT_LIMIT:  # May have missed some
+                messages = await channel.fetch_messages(limit=ANNOUNCEMENT_LIMIT)
+        if full:
+            self.announcements[channel_id] = []
+        await self.add_announcements(channel_id, server, messages)
 
-            for message in await channel.history(10).fetch():
-                no_emojis = re.compile(r"<:(\w+):\d{18,19}>").sub(
-                    r":\1:", message.content
-                )
+    async def on_message(self: "ServerManager", message: Message) -> None:
+        """Add a message to the updates if it was sent in an update channel.
 
-                replaced = []
-                for mention in re.compile(r"<@&?(\d{18,19})>").finditer(no_emojis):
-                    if mention in replaced:
-                        continue
-                    replaced.append(mention)
-                    if "&" in mention.group(0):
-                        guild = await self.client.fetch_guild(server.guild_id)
-                        for role in guild.roles:
-                            if str(role.id) == mention.group(1):
-                                break
-                        no_emojis = no_emojis.replace(mention.group(0), "@" + role.name)
-                        continue
-                    member = await self.client.fetch_member(
-                        mention.group(1), server.guild_id
-                    )
-                    no_emojis = no_emojis.replace(
-                        mention.group(0), "@" + member.display_name
-                    )
-
-                self.updates["updates"].append(no_emojis)
-                self.updates["timestamps"].append(
-                    str(round(message.created_at.timestamp()))
-                )
+        Args:
+        ----
+        message (Message): The message that was sent
+        """
+        channel_id = str(message.channel.id)
+        if channel_id not in self.update_channels:
+            return
+        await self.add_announcements(
+            channel_id, self.update_channels[channel_id], [message]
+        )
+        self.publish_announcements()
+
+    async def on_message_update(self: "ServerManager", message: Message) -> None:
+        """Format an edited message again if it is one of the updates.
+
+        Args:
+        ----
+        message (Message): The message after it was edited
+        """
+        channel_id = str(message.channel.id)
+        known = self.announcements.get(channel_id, [])
+        if all(message_id != int(message.id) for message_id, _, _ in known):
+            return
+        await self.add_announcements(
+            channel_id, self.update_channels[channel_id], [message], replace=True
+        )
+        self.publish_announcements()
+
+    def on_message_delete(self: "ServerManager", message_id: int) -> None:
+        """Remove a deleted message from the updates.
+
+        Args:
+        ----
+        message_id (int): The id of the deleted message
+        """
+        for channel_id, known in self.announcements.items():
+            remaining = [entry for entry in known if entry[0] != message_id]
+            if len(remaining) < len(known):
+                self.announcements[channel_id] = remaining
+                self.publish_announcements()
+                return
+
+    async def add_announcements(
+        self: "ServerManager",
+        channel_id: str,
+        server: Server,
+        messages: list[Message],
+        *,
+        replace: bool = False,
+    ) -> None:
+        """Format messages and keep the newest for a channel.
+
+        Args:
+        ----
+        channel_id (str): The id of the update channel
+        server (Server): The server the channel belongs to
+        messages (list[Message]): The messages to add
+        replace (bool): Optional, format messages that were already added again
+        """
+        known = self.announcements.get(channel_id, [])
+        if replace:
+            replaced = {int(message.id) for message in messages}
+            known = [entry for entry in known if entry[0] not in replaced]
+        seen = {message_id for message_id, _text, _timestamp in known}
+        messages = [message for message in messages if int(message.id) not in seen]
+        texts = await gather(
+            *(self.format_announcement(message, server) for message in messages)
+        )
+        known = known + [
+            (int(message.id), text, str(round(message.created_at.timestamp())))
+            for message, text in zip(messages, texts, strict=True)
+        ]
+        known.sort(reverse=True)
+        self.announcements[channel_id] = known[:ANNOUNCEMENT_LIMIT]
+
+    def publish_announcements(self: "ServerManager") -> None:
+        """Serve the newest messages from every update channel."""
+        updates: dict[str, list[str]] = {"updates": [], "timestamps": []}
+        for channel_id in self.update_channels:
+            for _message_id, text, timestamp in self.announcements.get(channel_id, []):
+                updates["updates"].append(text)
+                updates["timestamps"].append(timestamp)
+        self.set_updates(updates)
+
+    async def format_announcement(
+        self: "ServerManager", message: Message, server: Server
+    ) -> str:
+        """Replace custom emojis and mentions in a message with plain text.
+
+        Args:
+        ----
+        message (Message): The message to format
+        server (Server): The server the message was sent in
+        """
+        text = EMOJI_PATTERN.sub(r":\1:", message.content)
+        mentions = {
+            mention.group(0): mention for mention in MENTION_PATTERN.finditer(text)
+        }
+        names = await gather(
+            *(
+                self.mention_name(server.guild_id, mention)
+                for mention in mentions.values()
+            )
+        )
+        for mention_text, name in zip(mentions, names, strict=True):
+            if name is not None:
+                text = text.replace(mention_text, "@" + name)
+        return text
+
+    async def mention_name(
+        self: "ServerManager", guild_id: str, mention: re.Match
+    ) -> Optional[str]:
+        """Get the name of a mentioned role or member.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild the mention was in
+        mention (Match): The matched mention
+        """
+        if "&" in mention.group(0):
+            roles: Optional[dict[str, str]] = self.roles.get(guild_id)
+            if roles is None:
+                guild = await self.client.fetch_guild(guild_id)
+                if guild is None:
+                    return None
+                roles = {str(role.id): role.name for role in guild.roles}
+                self.roles.set(guild_id, roles)
+            return roles.get(mention.group(1))
+
+        return await self.member_name(guild_id, mention.group(1), fallback=False)
+
+    async def member_name(
+        self: "ServerManager", guild_id: str, user_id: str, *, fallback: bool = True
+    ) -> Optional[str]:
+        """Get the display name of a member, caching it.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild the member is in
+        user_id (str): The id of the member
+        fallback (bool): Optional, use the user's name if they have left the guild
+        """
+        name: Optional[str] = self.members.get((guild_id, user_id))
+        if name is not None:
+            return name
+        async with self.member_lookups:
+            user = await self.client.fetch_member(user_id, guild_id)
+            if user is None and fallback:
+                user = await self.client.fetch_user(user_id)
+        if user is None:
+            return None
+        self.members.set((guild_id, user_id), user.display_name)
+        return user.display_name
+
+    async def member_names(
+        self: "ServerManager", guild_id: str, user_ids: list[str]
+    ) -> dict[str, str]:
+        """Get the display names of many members, fetching uncached ones at once.
+
+        Args:
+        ----
+        guild_id (str): The id of the guild the members are in
+        user_ids (list[str]): The ids of the members
+        """
+        names = await gather(
+            *(self.member_name(guild_id, user_id) for user_id in user_ids)
+        )
+        return {
+            user_id: name or "Unknown user"
+            for user_id, name in zip(user_ids, names, strict=True)
+        }
+
+    def set_updates(self: "ServerManager", updates: dict[str, list[str]]) -> None:
+        """Change the updates served, only re-encoding them if they changed.
+
+        Args:
+        ----
+        updates (dict): The updates and their timestamps
+        """
+        if updates == self.updates:
+            return
+        self.updates = updates
+        self.updates_body = CachedBody(
+            dumps(updates).encode(), "application/json", compress=True
+        )
+
+    async def close(self: "ServerManager") -> None:
+        """Finish queued events, close connections and save buffered results.
+
+        Called when the bot disconnects, which it can reconnect after, so the
+        stores are left open.
+        """
+        await self.events.stop()
+        await self.api.close()
+        await self.history.flush()
+        await self.meta.checkpoint()
+        await self.ratings.flush()
+
+    async def shutdown(self: "ServerManager") -> None:
+        """Close connections and the stores, once the bot has stopped for good."""
+        await self.close()
+        self.match_store.close()
+        await self.history.close()
+        await self.ratings.close()
+
+    async def sweep(self: "ServerManager") -> None:
+        """Forget prepared and followed games that never finished."""
+        for server in set(self.server_links.values()):
+            server.sweep(self.tracking_ttl)
+
+    async def get_metrics(self: "ServerManager", _req: Request) -> Response:
+        """Get statistics about the bot's background work."""
+        return json_response(
+            {
+                "events": self.events.metrics(),
+                "gauges": {name: gauge() for name, gauge in self.gauges.items()},
+            }
+        )
 
-    async def get_updates(self: "ServerManager", _req: Request) -> Response:
+    async def get_updates(self: "ServerManager", req: Request) -> Response:
         """Get formatted updates from discord servers."""
-        return json_response(self.updates)
+        return self.updates_body.respond(req)
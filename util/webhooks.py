@@ -0,0 +1,301 @@
+"""Parsing and validation shared by the webhook endpoints."""
+from functools import wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+    TypedDict,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+    is_typeddict,
+)
+
+from aiohttp.web import Request, Response
+from pyjson5 import Json5Exception
+from pyjson5 import decode as decode_json5
+
+try:
+    from orjson import loads as decode_json
+except ImportError:
+    from json import loads as decode_json
+
+MAX_BODY_SIZE = 1024 * 1024
+
+Check = Callable[[Any, str], list[str]]
+
+
+class CardState(TypedDict):
+
+    """A card in a player's deck."""
+
+    cardId: str
+
+
+class PlayerState(TypedDict):
+
+    """The parts of a player's state the bot reads."""
+
+    id: str
+    censoredPlayerName: str
+    minecraftName: str
+    lives: int
+    pile: list[CardState]
+    hand: list[CardState]
+    discarded: list[CardState]
+    board: dict
+
+
+class GameState(TypedDict):
+
+    """The parts of a game's state the bot reads."""
+
+    players: dict[str, PlayerState]
+
+
+class EndInfo(TypedDict):
+
+    """How a game ended, the winner is None for a draw."""
+
+    winner: Optional[str]
+
+
+class GameStartPayload(TypedDict):
+
+    """Data sent when a game starts."""
+
+    createdTime: int
+    id: str
+    code: Optional[str]
+    playerIds: list[str]
+    playerNames: list[str]
+    state: GameState
+
+
+class GameEndPayload(TypedDict):
+
+    """Data sent when a game ends."""
+
+    createdTime: int
+    id: str
+    code: Optional[str]
+    playerIds: list[str]
+    playerNames: list[str]
+    endInfo: EndInfo
+    endTime: int
+
+
+class PrivateCancelPayload(TypedDict):
+
+    """Data sent when a private game is cancelled."""
+
+    code: str
+
+
+def accepted_types(hint: Any) -> tuple[type, ...]:  # noqa: ANN401
+    """Get the types `isinstance` should accept for a type hint.
+
+    Args:
+    ----
+    hint (Any): The type hint to convert
+    """
+    if get_origin(hint) is Union:
+        return tuple(
+            accepted for arg in get_args(hint) for accepted in accepted_types(arg)
+        )
+    if hint is int:
+        return (int, float)
+    if is_typeddict(hint):
+        return (dict,)
+    return (get_origin(hint) or hint,)
+
+
+def nested_check(hint: Any) -> Optional[Check]:  # noqa: ANN401
+    """Get a check for the contents of a value, or None if they aren't checked.
+
+    Objects described by a TypedDict are checked against it, as are the items of
+    lists and the values of dicts.
+
+    Args:
+    ----
+    hint (Any): The type hint of the value
+    """
+    if is_typeddict(hint):
+        schema = Schema(hint)
+        return lambda value, name: schema.validate(value, f"{name}.")
+    args = get_args(hint)
+    if get_origin(hint) not in (list, dict) or not args:
+        return None
+    item_hint = args[-1]
+    item_types = accepted_types(item_hint)
+    item_check = nested_check(item_hint)
+
+    def check(value: Any, name: str) -> list[str]:  # noqa: ANN401
+        items = value.items() if isinstance(value, dict) else enumerate(value)
+        problems = []
+        for key, item in items:
+            if not isinstance(item, item_types):
+                problems.append(f"{name}[{key}] has type {type(item).__name__}")
+            elif item_check is not None:
+                problems += item_check(item, f"{name}[{key}]")
+        return problems
+
+    return check
+
+
+class Schema:
+
+    """Precompiled checks for a webhook payload."""
+
+    def __init__(
+        self: "Schema",
+        payload_type: type,
+        check: Optional[Callable[[dict], list[str]]] = None,
+    ) -> None:
+        """Compile the checks for a payload.
+
+        Args:
+        ----
+        payload_type (type): The TypedDict describing the payload
+        check (Callable): Optional, gets the problems between fields of a payload
+        that matches the types
+        """
+        self.name: str = payload_type.__name__
+        self.checks: tuple[tuple[str, tuple[type, ...], Optional[Check]], ...] = tuple(
+            (key, accepted_types(hint), nested_check(hint))
+            for key, hint in get_type_hints(payload_type).items()
+        )
+        self.check: Optional[Callable[[dict], list[str]]] = check
+
+    def validate(
+        self: "Schema", data: Any, path: str = ""  # noqa: ANN401
+    ) -> list[str]:
+        """Get a list of problems with the data, empty if it is valid.
+
+        Args:
+        ----
+        data (Any): The decoded payload
+        path (str): Optional, the name of the payload's field to prefix problems with
+        """
+        if not isinstance(data, dict):
+            return [f"{path.rstrip('.') or self.name} must be an object"]
+        problems: list[str] = []
+        for key, types, nested in self.checks:
+            if key not in data:
+                problems.append(f"{path}{key} is missing")
+            elif not isinstance(data[key], types):
+                problems.append(f"{path}{key} has type {type(data[key]).__name__}")
+            elif nested is not None:
+                problems += nested(data[key], f"{path}{key}")
+        if not problems and self.check is not None:
+            problems += self.check(data)
+        return problems
+
+
+def check_players(data: dict) -> list[str]:
+    """Check every player has a name and a state if the payload has states.
+
+    Args:
+    ----
+    data (dict): A game start or end payload
+    """
+    problems = []
+    if len(data["playerIds"]) != len(data["playerNames"]):
+        problems.append("playerIds and playerNames have different lengths")
+    if "state" in data:
+        problems += [
+            f"state.players is missing {player_id}"
+            for player_id in data["playerIds"]
+            if player_id not in data["state"]["players"]
+        ]
+    if "endInfo" in data:
+        winner = data["endInfo"]["winner"]
+        if winner is not None and winner not in data["playerIds"]:
+            problems.append(f"endInfo.winner {winner} isn't a player")
+    return problems
+
+
+GAME_START_SCHEMA = Schema(GameStartPayload, check_players)
+GAME_END_SCHEMA = Schema(GameEndPayload, check_players)
+PRIVATE_CANCEL_SCHEMA = Schema(PrivateCancelPayload)
+
+
+def parse_json(body: bytes) -> Optional[Any]:  # noqa: ANN401
+    """Decode a json body, only falling back to json5 if strict parsing fails.
+
+    Args:
+    ----
+    body (bytes): The raw request body
+    """
+    try:
+        return decode_json(body)
+    except ValueError:
+        pass
+    try:
+        return decode_json5(body.decode())
+    except (Json5Exception, UnicodeDecodeError):
+        return None
+
+
+async def read_body(req: Request, max_size: int) -> Optional[bytes]:
+    """Read a request body, or None if it is larger than `max_size` bytes.
+
+    Args:
+    ----
+    req (Request): The web request sent
+    max_size (int): The largest body to accept in bytes
+    """
+    if req.content_length is not None and req.content_length > max_size:
+        return None
+    body = bytearray()
+    while chunk := await req.content.read(max_size + 1 - len(body)):
+        body += chunk
+        if len(body) > max_size:
+            return None
+    return bytes(body)
+
+
+def webhook(
+    schema: Schema, max_size: int = MAX_BODY_SIZE
+) -> Callable[[Callable[..., Awaitable[Response]]], Callable[..., Awaitable[Response]]]:
+    """Check the api key and payload of a webhook before calling the handler.
+
+    The handler is called with the server the request came from and the decoded
+    payload instead of the request.
+
+    Args:
+    ----
+    schema (Schema): The schema the payload must match
+    max_size (int): Optional, the largest body to accept in bytes
+    """
+
+    def decorator(
+        handler: Callable[..., Awaitable[Response]],
+    ) -> Callable[..., Awaitable[Response]]:
+        @wraps(handler)
+        async def wrapper(manager: Any, req: Request) -> Response:  # noqa: ANN401
+            api_key = req.headers.get("api-key")
+            server = manager.server_links.get(api_key)
+            if server is None:
+                print(f"Recieved request with invalid api key or url: {api_key}")
+                return Response(status=403)
+
+            body = await read_body(req, max_size)
+            if body is None:
+                return Response(status=413, reason="Payload too large")
+            payload = parse_json(body)
+            if payload is None:
+                return Response(status=400, reason="Invalid json payload")
+
+            problems = schema.validate(payload)
+            if problems:
+                problem_text = "\n- ".join(problems)
+                print(f"Invalid {schema.name}:\n- {problem_text}")
+                return Response(status=400)
+            return await handler(manager, server, payload)
+
+        return wrapper
+
+    return decorator